@@ -1,9 +1,17 @@
-from gym.envs.registration import register
-
-from baba_minigrid.minigrid import Wall
+def __getattr__(name):
+    # import the modules of the package only when they are used (importing gym and the envs is slow)
+    if name == "Wall":
+        from baba_minigrid.minigrid import Wall
+        return Wall
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def register_minigrid_envs():
+    # the env classes are only imported by gym.make (the entry points are strings)
+    from gym.envs.registration import register
+
+    from baba_minigrid.minigrid import Wall
+
     # register BabaIsYou envs
     register(
         id="BabaIsYou-GoToObj-v0",
@@ -1,20 +1,24 @@
 import hashlib
+import heapq
 import math
+import time
 from copy import copy
 from abc import abstractmethod
 from enum import IntEnum
-from typing import Any, Callable, Optional, Union
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple, Optional, Union
 
 import gym
 import numpy as np
 from gym import spaces
-from gym.utils import seeding
 
 # Size in pixels of a tile in the full-scale human view
 from baba_minigrid import flexible_world_object
 from baba_minigrid.flexible_world_object import make_obj, RuleColor, RuleObject, RuleIs, RuleProperty, Ruleset, RuleBlock
-from baba_minigrid.minigrid import Grid, TILE_PIXELS, DIR_TO_VEC, WorldObj, Wall, OBJECT_TO_IDX
+from baba_minigrid.minigrid import Grid, TILE_PIXELS, DIR_TO_VEC, WorldObj, Wall, OBJECT_TO_IDX, COLOR_TO_IDX, COLOR_NAMES
 from baba_minigrid.rendering import (
+    TileAtlas,
+    TileCache,
     downsample,
     fill_coords,
     highlight_img,
@@ -25,16 +29,20 @@ from baba_minigrid.rendering import (
     rotate_fn,
 )
 from baba_minigrid.window import Window
-from baba_minigrid.rule import extract_ruleset
+from baba_minigrid.rule import extract_ruleset, RuleIndex
+from baba_minigrid.utils import copy_state
 
+# (dx, dy) of each direction code as python ints (faster than the arrays of DIR_TO_VEC for single cells)
+DIR_TO_DELTA = [tuple(int(c) for c in vec) for vec in DIR_TO_VEC]
 
-def rand_int(low, high):
+
+def rand_int(low, high, np_random=None):
     """
-    Generate random integer in [low,high[
+    Generate random integer in [low,high[ with the random generator np_random (the global numpy random state if None)
     """
-    # TODO: seed
-    # return np_random.integers(low, high)
-    return np.random.randint(low, high)
+    if np_random is None:
+        return np.random.randint(low, high)
+    return int(np_random.integers(low, high))
 
 
 class BabaIsYouGrid:
@@ -42,8 +50,16 @@ class BabaIsYouGrid:
     Represent a grid and operations on it
     """
 
-    # Static cache of pre-renderer tiles
-    tile_cache = {}
+    # Static cache of pre-renderer tiles (use tile_cache.set_capacity to change the maximum number of tiles)
+    tile_cache = TileCache(capacity=4096)
+    # Static atlas of tiles for each tile size, used to render whole frames
+    tile_atlas = {}
+
+    # Number of objects to encode for each cell (set by BabaIsYouEnv)
+    encoding_level = 1
+
+    # Properties of the objects at the top of the cells whose positions are indexed (in addition to the rule blocks)
+    indexed_properties = ('is_agent', 'is_move', 'is_push', 'is_pull')
 
     def __init__(self, width, height):
         assert width >= 3
@@ -55,6 +71,18 @@ class BabaIsYouGrid:
         # self.grid = [[None]] * width * height  # self.grid[0].append(...) modifies all the elements and not just the first one
         self.grid = [[None] for _ in range(width * height)]
 
+        # positions of the cells modified since the last call to update_encoding
+        self.dirty = set()
+        # positions of the cells where a RuleBlock was added or removed from the top (used by RuleIndex)
+        self.rule_dirty = set()
+        # positions of the top objects with each indexed property, built by get_index
+        self._index = None
+        self._index_ruleset = None
+        # heaps of the positions added to the index of a property during the iterations of iter_index over it
+        self._index_iters = {}
+        # cells without any object, used to sample the positions where to place objects
+        self._free = np.ones((width, height), dtype=bool)
+
     def __eq__(self, other):
         grid1 = self.encode()
         grid2 = other.encode()
@@ -78,13 +106,16 @@ class BabaIsYouGrid:
         Remove the zth element in the list of objects at position i, j
         """
         idx = self._get_idx(i, j)
+        top = self.get(i, j)
         if z is None:
             self.grid[idx].pop()
         else:
             self.grid[idx].pop(z)
+        self._mark_dirty(i, j, top)
 
     def set(self, i, j, v):
         idx = self._get_idx(i, j)
+        top = self.get(i, j)
 
         if v is None:
             if self.grid[idx] == [None]:
@@ -95,6 +126,107 @@ class BabaIsYouGrid:
         else:
             # stack objects
             self.grid[idx].append(v)
+        self._mark_dirty(i, j, top)
+
+    def _mark_dirty(self, i, j, top):
+        """
+        Record that the cell i, j has been modified, top being the object at the top of the cell before the modification
+        """
+        self.dirty.add((i, j))
+        new_top = self.get(i, j)
+        # the rules only depend on the objects at the top of the cells
+        if isinstance(top, RuleBlock) or isinstance(new_top, RuleBlock):
+            self.rule_dirty.add((i, j))
+        if self._index is not None:
+            self.update_index(i, j)
+        if self._free is not None:
+            self._free[i, j] = new_top is None
+
+    def mark_all_dirty(self):
+        """
+        Mark all the cells as modified, so that the next observation re-encodes the whole grid
+        """
+        self.dirty.update((i, j) for j in range(self.height) for i in range(self.width))
+
+    def free_cells(self):
+        """
+        Boolean array of shape (width, height) of the cells without any object
+        """
+        return self._free.copy()
+
+    def get_index(self, prop):
+        """
+        Return the set of positions (j * width + i) of the objects at the top of the cells with the property prop (one
+        of indexed_properties or 'rule_block'). The index is updated when the grid is modified and rebuilt when the
+        ruleset changes.
+        """
+        ruleset = getattr(self, '_ruleset', None)
+        ruleset_key = (ruleset, getattr(ruleset, 'version', None))
+        if self._index is None or self._index_ruleset[0] is not ruleset or self._index_ruleset[1] != ruleset_key[1]:
+            self._index = {prop: set() for prop in self.indexed_properties + ('rule_block',)}
+            self._index_ruleset = ruleset_key
+            for k, e in enumerate(self):
+                self._add_to_index(k, e)
+        return self._index[prop]
+
+    def _add_to_index(self, k, e):
+        if e is None:
+            return
+        for prop in self.indexed_properties:
+            if getattr(e, prop)():
+                self._add_position(prop, k)
+        if isinstance(e, RuleBlock):
+            self._add_position('rule_block', k)
+
+    def _add_position(self, prop, k):
+        self._index[prop].add(k)
+        for added in self._index_iters.get(prop, ()):
+            heapq.heappush(added, k)
+
+    def update_index(self, i, j):
+        """
+        Update the index of the properties for the cell i, j
+        """
+        k = int(j) * self.width + int(i)
+        for positions in self._index.values():
+            positions.discard(k)
+        self._add_to_index(k, self.get(i, j))
+
+    def iter_index(self, prop):
+        """
+        Iterate over the positions (i, j) of the top objects with the property prop in row-major order. Same as
+        iterating over the grid and filtering the objects: the grid can be modified during the iteration, the next
+        position is the first one after the current position with an object having the property.
+
+        The positions in the index at the start are iterated in sorted order, merged with a heap of the positions added
+        during the iteration, and the removed positions are skipped, so the cost is proportional to the number of
+        objects with the property (up to a log factor).
+        """
+        positions = sorted(self.get_index(prop))
+        added = []
+        iters = self._index_iters.setdefault(prop, [])
+        iters.append(added)
+        try:
+            n, k = 0, -1
+            while True:
+                # next position after k in the sorted positions or in the added ones
+                while n < len(positions) and positions[n] <= k:
+                    n += 1
+                while len(added) > 0 and added[0] <= k:
+                    heapq.heappop(added)
+                if n < len(positions) and (len(added) == 0 or positions[n] <= added[0]):
+                    k = positions[n]
+                elif len(added) > 0:
+                    k = added[0]
+                else:
+                    return
+
+                # skip the positions removed from the index since the start of the iteration
+                if k in self.get_index(prop):
+                    yield k % self.width, k // self.width
+        finally:
+            # remove the heap of this iteration (compared by identity, the heaps of other iterations can be equal)
+            del iters[next(idx for idx, heap in enumerate(iters) if heap is added)]
 
     def get(self, i, j, z=-1):
         """
@@ -164,12 +296,13 @@ class BabaIsYouGrid:
         Render a tile and cache the result
         """
 
-        # Hash map lookup key for the cache
-        key = (agent_dir, highlight, tile_size)
-        key = obj.encode() + key if obj else key
+        # Hash map lookup key for the cache (agent_dir is not part of the key since it doesn't change the tile)
+        key = (highlight, tile_size)
+        key = obj.encode() + (getattr(obj, 'dir', 0),) + key if obj else key
 
-        if key in cls.tile_cache:
-            return cls.tile_cache[key]
+        img = cls.tile_cache.get(key)
+        if img is not None:
+            return img
 
         img = np.zeros(
             shape=(tile_size * subdivs, tile_size * subdivs, 3), dtype=np.uint8
@@ -202,10 +335,31 @@ class BabaIsYouGrid:
         img = downsample(img, subdivs)
 
         # Cache the rendered tile
-        cls.tile_cache[key] = img
+        cls.tile_cache.put(key, img)
 
         return img
 
+    @classmethod
+    def warm_up_tile_cache(cls, tile_size=TILE_PIXELS, highlight=False):
+        """
+        Pre-render the tiles of all the known objects, colors and directions for a given tile size
+        """
+        objs = [None]
+        for color in COLOR_NAMES:
+            objs.append(Wall(color))
+            objs.extend(make_obj(name, color) for name in flexible_world_object.objects)
+            objs.append(RuleColor(color))
+        objs.extend(make_obj(name) for name in flexible_world_object.objects)
+        objs.extend(RuleObject(name) for name in flexible_world_object.objects)
+        objs.extend(RuleProperty(prop) for prop in flexible_world_object.properties)
+        objs.append(RuleIs())
+
+        for obj in objs:
+            for dir in range(4) if hasattr(obj, 'dir') else [0]:
+                if obj is not None:
+                    obj.dir = dir
+                cls.render_tile(obj, highlight=highlight, tile_size=tile_size)
+
     def render(self, tile_size, agent_pos=None, agent_dir=None, highlight_mask=None):
         """
         Render this grid at a given scale
@@ -216,54 +370,77 @@ class BabaIsYouGrid:
         if highlight_mask is None:
             highlight_mask = np.zeros(shape=(self.width, self.height), dtype=bool)
 
-        # Compute the total grid size
-        width_px = self.width * tile_size
-        height_px = self.height * tile_size
+        # pack the (type, color, state, dir) of the top object and the highlight of each cell in a single tile key
+        codes = self.encode_top_objects().astype(np.int64)
+        keys = (((codes[..., 0] * 256 + codes[..., 1]) * 256 + codes[..., 2]) * 4 + codes[..., 3]) * 2
+        keys += highlight_mask
 
-        img = np.zeros(shape=(height_px, width_px, 3), dtype=np.uint8)
+        unique_keys, first_cell, inverse = np.unique(keys.ravel(), return_index=True, return_inverse=True)
 
-        # Render the grid
-        for j in range(0, self.height):
-            for i in range(0, self.width):
-                cell = self.get(i, j)
+        def _make_tile(k):
+            # render the tile from a cell with the key unique_keys[k]
+            i, j = np.unravel_index(first_cell[k], keys.shape)
+            return BabaIsYouGrid.render_tile(self.get(i, j), highlight=highlight_mask[i, j], tile_size=tile_size)
 
-                agent_here = np.array_equal(agent_pos, (i, j))
-                tile_img = BabaIsYouGrid.render_tile(
-                    cell,
-                    agent_dir=agent_dir if agent_here else None,
-                    highlight=highlight_mask[i, j],
-                    tile_size=tile_size,
-                )
+        if tile_size not in BabaIsYouGrid.tile_atlas:
+            BabaIsYouGrid.tile_atlas[tile_size] = TileAtlas(tile_size)
+        atlas = BabaIsYouGrid.tile_atlas[tile_size]
 
-                ymin = j * tile_size
-                ymax = (j + 1) * tile_size
-                xmin = i * tile_size
-                xmax = (i + 1) * tile_size
-                img[ymin:ymax, xmin:xmax, :] = tile_img
+        tile_idx = atlas.indices(unique_keys.tolist(), _make_tile)[inverse].reshape(keys.shape)
+        return atlas.gather(tile_idx)
 
-        return img
+    def encode_top_objects(self):
+        """
+        Return the (type, color, state, dir) of the object at the top of each cell, array of shape (width, height, 4)
+        """
+        empty = (OBJECT_TO_IDX["empty"], 0, 0, 0)
+        codes = [
+            cell[-1].encode() + (getattr(cell[-1], 'dir', 0),) if len(cell) > 1 else empty
+            for cell in self.grid
+        ]
+        codes = np.array(codes, dtype="uint8").reshape(self.height, self.width, 4)
+        return np.ascontiguousarray(codes.transpose(1, 0, 2))
 
     def encode(self, vis_mask=None):
         """
         Produce a compact numpy encoding of the grid
         """
 
-        if vis_mask is None:
-            vis_mask = np.ones((self.width, self.height), dtype=bool)
+        # the cells are stored in row-major order
+        array = self._encode_cells(self.grid).reshape(self.height, self.width, 3 * self.encoding_level)
+        array = np.ascontiguousarray(array.transpose(1, 0, 2))
 
-        array = np.zeros((self.width, self.height, 3 * self.encoding_level), dtype="uint8")
+        if vis_mask is not None:
+            array[~vis_mask] = 0
+        return array
 
-        def _encode_cell_objects(i, j):
-            v_arr = np.zeros(3 * self.encoding_level)
-            for idx, z in enumerate(range(1, self.encoding_level + 1)):
-                v = self.get(i, j, -z)
-                v_arr[idx * 3:(idx + 1) * 3] = self.encode_cell(v)
-            return v_arr
+    def _encode_cells(self, cells):
+        """
+        Encode the encoding_level objects at the top of each cell in a list of cells
+        """
+        empty = (OBJECT_TO_IDX["empty"], 0, 0)
+        levels = range(1, self.encoding_level + 1)
+        codes = [
+            [cell[-z].encode() if len(cell) > z else empty for z in levels]
+            for cell in cells
+        ]
+        return np.array(codes, dtype="uint8").reshape(len(cells), 3 * self.encoding_level)
+
+    def encode_cells(self, i, j):
+        """
+        Encode the cells at positions (i[k], j[k]), return an array of shape (len(i), 3 * encoding_level)
+        """
+        return self._encode_cells([self.grid[_j * self.width + _i] for _i, _j in zip(i, j)])
 
-        for i in range(self.width):
-            for j in range(self.height):
-                if vis_mask[i, j]:
-                    array[i, j] = _encode_cell_objects(i, j)
+    def update_encoding(self, array):
+        """
+        Update an encoding of the grid returned by encode (without vis_mask) by re-encoding only the cells modified
+        since the last update
+        """
+        if len(self.dirty) > 0:
+            i, j = np.array(list(self.dirty), dtype=int).T
+            array[i, j] = self.encode_cells(i, j)
+            self.dirty.clear()
         return array
 
     def encode_cell(self, v):
@@ -332,6 +509,412 @@ class BabaIsYouGrid:
 
         return mask
 
+    def set_dir(self, i, j, dir):
+        """
+        Change the direction of the object at the top of the cell i, j
+        """
+        self.get(i, j).dir = dir
+
+    def get_state(self):
+        """
+        Snapshot of the objects in each cell and of their direction (the objects are not copied)
+        """
+        cells = tuple(tuple(cell) for cell in self.grid)
+        dirs = tuple((obj, obj.dir) for cell in cells for obj in cell[1:] if hasattr(obj, 'dir'))
+        return cells, dirs
+
+    def set_state(self, state):
+        """
+        Restore a snapshot returned by get_state
+        """
+        cells, dirs = state
+        self.grid = [list(cell) for cell in cells]
+        for obj, dir in dirs:
+            obj.dir = dir
+        self.dirty.clear()
+        self.rule_dirty.clear()
+        self._index = None
+        self._free = np.array([len(cell) == 1 for cell in self.grid]).reshape(self.height, self.width).T.copy()
+
+    @classmethod
+    def from_array(cls, array):
+        """
+        Make a grid with new objects from an array of shape (width, height, max_stack, 4) encoding the objects stacked
+        in each cell like BabaIsYouArrayGrid.array
+        """
+        array = np.asarray(array)
+        width, height = array.shape[:2]
+        grid = cls(width, height)
+        # the nonzero positions are sorted by cell and from the bottom to the top of the stacks
+        stacked = array[..., OBJ_TYPE] != OBJECT_TO_IDX["empty"]
+        cells_i, cells_j, _ = np.nonzero(stacked)
+        for i, j, codes in zip(cells_i.tolist(), cells_j.tolist(), array[stacked].tolist()):
+            grid.grid[j * width + i].append(decode_obj(*codes))
+        grid._free = ~stacked.any(axis=2)
+        return grid
+
+
+# Fields of the array encoding of an object in BabaIsYouArrayGrid
+OBJ_TYPE, OBJ_COLOR, OBJ_DIR, OBJ_FLAGS = range(4)
+# Bit set in the flags field if the object is a rule block that can be pushed
+FLAG_PUSH = 1
+
+# Class and attributes of the objects decoded by decode_obj, copied to make new objects with the same encoding
+_decoded_objs = {}
+
+
+def decode_obj(type_idx, color_idx, dir=0, flags=0):
+    """
+    Make a new object from its encoding in a BabaIsYouArrayGrid (the inverse of BabaIsYouArrayGrid.encode_obj)
+    """
+    key = (type_idx, color_idx, dir, flags)
+    if key not in _decoded_objs:
+        obj_type = IDX_TO_OBJECT_TYPE[type_idx]
+        # the rule blocks are encoded with their name instead of their color
+        name = IDX_TO_COLOR_NAME[color_idx]
+        is_push = bool(flags & FLAG_PUSH)
+
+        if obj_type == 'rule_object':
+            obj = RuleObject(name, is_push=is_push)
+        elif obj_type == 'rule_property':
+            obj = RuleProperty(name, is_push=is_push)
+        elif obj_type == 'rule_is':
+            obj = RuleIs(is_push=is_push)
+        elif obj_type == 'rule_color':
+            obj = RuleColor(name, is_push=is_push)
+        elif obj_type in flexible_world_object.objects:
+            obj = make_obj(obj_type, name)
+            obj.dir = dir
+        else:
+            obj = WorldObj.decode(type_idx, color_idx, 0)
+        _decoded_objs[key] = obj.__class__, [
+            (attr, getattr(obj, attr)) for attr in _slot_names(obj.__class__) if hasattr(obj, attr)
+        ]
+
+    # shallow copy, faster than copy.copy for the many walls of a level
+    obj_cls, attrs = _decoded_objs[key]
+    obj = object.__new__(obj_cls)
+    for attr, value in attrs:
+        setattr(obj, attr, value)
+    return obj
+
+
+def _slot_names(cls):
+    """
+    Names of the attributes declared in the __slots__ of the class and of its base classes
+    """
+    return [attr for base in cls.__mro__ for attr in base.__dict__.get('__slots__', ())]
+
+
+IDX_TO_OBJECT_TYPE = {idx: obj_type for obj_type, idx in OBJECT_TO_IDX.items()}
+IDX_TO_COLOR_NAME = {idx: name for name, idx in COLOR_TO_IDX.items()}
+
+
+class BabaIsYouArrayGrid(BabaIsYouGrid):
+    """
+    Grid storing the stacked objects of each cell in a preallocated array of shape (width, height, max_stack, 4), the
+    last dimension being (type, color, dir, flags), along with the number of objects stacked in each cell. The objects
+    are kept in a parallel object array so that get returns the same instances as BabaIsYouGrid.
+    """
+
+    def __init__(self, width, height, max_stack=4):
+        assert width >= 3
+        assert height >= 3
+        assert max_stack >= 1
+
+        self.width = width
+        self.height = height
+        self.max_stack = max_stack
+
+        self.array = np.zeros((width, height, max_stack, 4), dtype=np.uint8)
+        self.array[..., OBJ_TYPE] = OBJECT_TO_IDX["empty"]
+        self.objects = np.empty((width, height, max_stack), dtype=object)
+        self.stack_height = np.zeros((width, height), dtype=np.int32)
+
+        # positions of the cells modified since the last call to update_encoding
+        self.dirty = set()
+        # positions of the cells where a RuleBlock was added or removed from the top (used by RuleIndex)
+        self.rule_dirty = set()
+        # positions of the top objects with each indexed property, built by get_index
+        self._index = None
+        self._index_ruleset = None
+        # heaps of the positions added to the index of a property during the iterations of iter_index over it
+        self._index_iters = {}
+        # the free cells are the ones with a stack height of 0
+        self._free = None
+
+    @classmethod
+    def from_grid(cls, grid, max_stack=4):
+        """
+        Make an array grid with the same objects as a BabaIsYouGrid
+        """
+        cells = grid.grid
+        heights = [len(cell) - 1 for cell in cells]
+        while max_stack < max(heights, default=0):
+            max_stack *= 2
+        new_grid = cls(grid.width, grid.height, max_stack=max_stack)
+
+        # set all the objects at once instead of stacking them one by one
+        objs = [obj for cell in cells for obj in cell[1:]]
+        if len(objs) > 0:
+            k = np.repeat(np.arange(len(cells)), heights)
+            z = np.arange(len(objs)) - np.repeat(np.cumsum(heights) - heights, heights)
+            i, j = k % grid.width, k // grid.width
+            new_grid.array[i, j, z] = [cls.encode_obj(obj) for obj in objs]
+            objects = np.empty(len(objs), dtype=object)
+            objects[:] = objs
+            new_grid.objects[i, j, z] = objects
+            new_grid.stack_height[i, j] = z + 1
+            # same modified cells as when setting the objects one by one
+            new_grid.dirty.update(zip(i.tolist(), j.tolist()))
+            is_rule = np.array([isinstance(obj, RuleBlock) for obj in objs])
+            new_grid.rule_dirty.update(zip(i[is_rule].tolist(), j[is_rule].tolist()))
+
+        for attr in ["encoding_level", "_ruleset"]:
+            if hasattr(grid, attr):
+                setattr(new_grid, attr, getattr(grid, attr))
+        return new_grid
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.asarray(array)
+        width, height, max_stack = array.shape[:3]
+        grid = cls(width, height, max_stack=max(max_stack, 1))
+        stacked = array[..., OBJ_TYPE] != OBJECT_TO_IDX["empty"]
+        grid.array[:, :, :max_stack] = array
+        grid.stack_height[...] = stacked.sum(axis=2)
+        grid.objects[stacked] = [decode_obj(*codes) for codes in array[stacked].tolist()]
+        return grid
+
+    @property
+    def grid(self):
+        """
+        List of the objects in each cell, in the same layout as BabaIsYouGrid.grid
+        """
+        stacks = self.objects.transpose(1, 0, 2).reshape(-1, self.max_stack).tolist()
+        heights = self.stack_height.T.ravel().tolist()
+        return [[None, *stack[:h]] for stack, h in zip(stacks, heights)]
+
+    @staticmethod
+    def encode_obj(v):
+        type_idx, color_idx, _ = v.encode()
+        flags = FLAG_PUSH if isinstance(v, RuleBlock) and v.is_push() else 0
+        return type_idx, color_idx, getattr(v, "dir", 0), flags
+
+    def _grow(self):
+        """
+        Double the maximum number of objects that can be stacked in a cell
+        """
+        pad = [(0, 0), (0, 0), (0, self.max_stack)]
+        self.array = np.pad(self.array, pad + [(0, 0)])
+        self.array[:, :, self.max_stack:, OBJ_TYPE] = OBJECT_TO_IDX["empty"]
+        self.objects = np.pad(self.objects, pad, constant_values=None)
+        self.max_stack *= 2
+
+    def _clear(self, i, j, z):
+        self.array[i, j, z] = (OBJECT_TO_IDX["empty"], 0, 0, 0)
+        self.objects[i, j, z] = None
+
+    def pop(self, i, j, z=None):
+        """
+        Remove the zth element in the list of objects at position i, j (z = 0 refers to the empty bottom of the cell
+        like in BabaIsYouGrid)
+        """
+        assert 0 <= i < self.width
+        assert 0 <= j < self.height
+
+        h = self.stack_height[i, j]
+        if z is None:
+            k = h - 1
+        elif z >= 0:
+            k = z - 1
+        else:
+            k = h + z
+
+        if k < 0:
+            # nothing to remove
+            return
+
+        top = self.objects[i, j, h - 1]
+        # shift the objects above k down
+        self.array[i, j, k:h - 1] = self.array[i, j, k + 1:h]
+        self.objects[i, j, k:h - 1] = self.objects[i, j, k + 1:h]
+        self._clear(i, j, h - 1)
+        self.stack_height[i, j] = h - 1
+        self._mark_dirty(i, j, top)
+
+    def set(self, i, j, v):
+        assert 0 <= i < self.width
+        assert 0 <= j < self.height
+
+        h = self.stack_height[i, j]
+        top = self.objects[i, j, h - 1] if h > 0 else None
+        if v is None:
+            # remove the obj at the top
+            if h > 0:
+                self._clear(i, j, h - 1)
+                self.stack_height[i, j] = h - 1
+        else:
+            # stack objects
+            if h == self.max_stack:
+                self._grow()
+            self.array[i, j, h] = self.encode_obj(v)
+            self.objects[i, j, h] = v
+            self.stack_height[i, j] = h + 1
+        self._mark_dirty(i, j, top)
+
+    def get(self, i, j, z=-1):
+        """
+        Args:
+            z: return the object at the top if -1
+        """
+        assert 0 <= i < self.width
+        assert 0 <= j < self.height
+
+        h = self.stack_height[i, j]
+        if z == 'all':
+            return [None, *self.objects[i, j, :h]]
+
+        k = z - 1 if z >= 0 else h + z
+        if k < 0 or k >= h:
+            return None
+        return self.objects[i, j, k]
+
+    def get_under(self, i, j):
+        # return the second object in the cell
+        return self.get(i, j, -2)
+
+    def encode(self, vis_mask=None):
+        """
+        Produce a compact numpy encoding of the grid
+        """
+        array = self._encode_stacks(self.array, self.stack_height)
+
+        if vis_mask is not None:
+            array[~vis_mask] = 0
+        return array
+
+    def _encode_stacks(self, array, stack_height):
+        """
+        Encode the encoding_level objects at the top of stacks of shape (..., max_stack, 4)
+        """
+        # index of the encoding_level objects at the top of each stack, negative if there is no object
+        z = stack_height[..., None] - np.arange(1, self.encoding_level + 1)
+        codes = np.take_along_axis(array[..., :OBJ_DIR], np.maximum(z, 0)[..., None], axis=-2)
+
+        # the state is not stored in the array (always 0 for the objects of BabaIsYou)
+        encoding = np.zeros(z.shape + (3,), dtype="uint8")
+        encoding[..., :OBJ_DIR] = codes
+        encoding[z < 0] = (OBJECT_TO_IDX["empty"], 0, 0)
+        return encoding.reshape(*z.shape[:-1], 3 * self.encoding_level)
+
+    def encode_cells(self, i, j):
+        return self._encode_stacks(self.array[i, j], self.stack_height[i, j])
+
+    def encode_top_objects(self):
+        top = np.take_along_axis(self.array, np.maximum(self.stack_height - 1, 0)[..., None, None], axis=2)[:, :, 0]
+
+        codes = np.zeros((self.width, self.height, 4), dtype="uint8")
+        codes[..., 0] = top[..., OBJ_TYPE]
+        codes[..., 1] = top[..., OBJ_COLOR]
+        codes[..., 3] = top[..., OBJ_DIR]
+        codes[self.stack_height == 0] = (OBJECT_TO_IDX["empty"], 0, 0, 0)
+        return codes
+
+    def set_dir(self, i, j, dir):
+        h = self.stack_height[i, j]
+        self.objects[i, j, h - 1].dir = dir
+        self.array[i, j, h - 1, OBJ_DIR] = dir
+
+    def get_state(self):
+        state = (self.array.copy(), self.objects.copy(), self.stack_height.copy())
+        for array in state:
+            array.flags.writeable = False
+        return state
+
+    def set_state(self, state):
+        array, objects, stack_height = state
+        if array.shape == self.array.shape:
+            # restore in place (the arrays can be views of the stacked arrays of a vectorized env)
+            self.array[...] = array
+            self.objects[...] = objects
+            self.stack_height[...] = stack_height
+        else:
+            self.array, self.objects, self.stack_height = array.copy(), objects.copy(), stack_height.copy()
+            self.max_stack = array.shape[2]
+
+        # the directions of the objects are stored in the array
+        mask = np.arange(self.max_stack) < self.stack_height[..., None]
+        for obj, dir in zip(self.objects[mask].tolist(), self.array[mask][:, OBJ_DIR].tolist()):
+            if hasattr(obj, 'dir'):
+                obj.dir = dir
+        self.dirty.clear()
+        self.rule_dirty.clear()
+        self._index = None
+
+    def free_cells(self):
+        return self.stack_height == 0
+
+    def top_objects(self):
+        """
+        Array of shape (width, height) of the objects at the top of the cells (None for the empty cells)
+        """
+        z = np.maximum(self.stack_height - 1, 0)
+        top = np.take_along_axis(self.objects, z[..., None], axis=2)[..., 0]
+        top[self.stack_height == 0] = None
+        return top
+
+    def __iter__(self):
+        # same order as BabaIsYouGrid (row-major)
+        return iter(self.top_objects().T.ravel().tolist())
+
+
+def _splitmix64(x):
+    """
+    Mix the bits of a 64-bit integer (python int)
+    """
+    mask = 0xFFFFFFFFFFFFFFFF
+    x = (x + 0x9E3779B97F4A7C15) & mask
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & mask
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & mask
+    return x ^ (x >> 31)
+
+
+def zobrist_keys(i, j, encoding):
+    """
+    Zobrist key of the encoding of the cells i, j (last dimension of encoding), i.e. the XOR of a random 64-bit key
+    for each (i, j, channel, value). The keys are computed by hashing (i, j, channel, value) with splitmix64 instead of
+    being stored in a table.
+    """
+    encoding = np.asarray(encoding, dtype=np.uint64)
+    channel = np.arange(encoding.shape[-1], dtype=np.uint64)
+    i = np.asarray(i, dtype=np.uint64)[..., None]
+    j = np.asarray(j, dtype=np.uint64)[..., None]
+    x = (((i << np.uint64(8)) + j << np.uint64(8)) + channel << np.uint64(8)) + encoding
+
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return np.bitwise_xor.reduce(x, axis=-1)
+
+
+class EnvState(NamedTuple):
+    """
+    Immutable snapshot of a BabaIsYouEnv returned by get_state. The objects of the grid are shared with the env
+    instead of being copied, their mutable state (direction) is stored in the snapshot.
+    """
+    grid: tuple
+    obs: np.ndarray
+    ruleset: Ruleset
+    ruleset_state: tuple
+    # rules indexed by the position of their 'is' block
+    rules: tuple
+    # attributes of the env (agent position and direction, step count, attributes set by _gen_grid, ...)
+    attrs: MappingProxyType
+    # state of the random generator of the env (used to generate the next levels)
+    np_random_state: dict
+
 
 class BabaIsYouEnv(gym.Env):
     metadata = {
@@ -367,6 +950,27 @@ class BabaIsYouEnv(gym.Env):
         # Number of objects to encode for each cell
         self.encoding_level = kwargs.get('encoding_level', 1)
 
+        # Storage of the grid objects: 'list' (BabaIsYouGrid) or 'array' (BabaIsYouArrayGrid)
+        self.grid_backend = kwargs.get('grid_backend', 'list')
+        assert self.grid_backend in ['list', 'array'], self.grid_backend
+
+        # Return a read-only view of the cached observation instead of a copy (the view is updated in place by the
+        # next call to step or reset)
+        self.readonly_obs = kwargs.get('readonly_obs', False)
+        # Cached observation, updated incrementally by gen_obs
+        self._obs = None
+        self._obs_grid = None
+        # Zobrist hash of the cached observation, updated with it
+        self._obs_hash = 0
+
+        # Check that states with the same Zobrist hash are identical, and fall back to digest if they are not
+        self.check_hash_collisions = kwargs.get('check_hash_collisions', False)
+        # Zobrist hash -> first state seen with this hash since the last reset (cleared at reset to bound the memory)
+        self._hash_states = {}
+
+        # StepProfiler recording the time of the phases of step and reset (see profiler.py)
+        self.profiler = kwargs.get('profiler', None)
+
         # Action enumeration for this environment
         self.actions = BabaIsYouEnv.Actions
 
@@ -402,28 +1006,121 @@ class BabaIsYouEnv(gym.Env):
 
         self.reset()
 
+    # attributes of the env that are not restored by set_state (the random generator is np_random with gym==0.21)
+    _state_excluded_attrs = {
+        'grid', '_obs', '_obs_grid', '_ruleset', '_rule_index', 'window', '_np_random', 'np_random', 'profiler',
+        '_hash_states'
+    }
+
     def get_ruleset(self):
         return self._ruleset
 
+    def get_state(self):
+        """
+        Return a snapshot of the state of the env that can be restored with set_state, much cheaper than a deepcopy of
+        the env
+        """
+        obs = self.gen_obs()
+        if self.readonly_obs:
+            obs = obs.copy()
+        obs.flags.writeable = False
+
+        # copy the mutable attributes (e.g. agent_pos array), which can be modified in place after the snapshot
+        attrs = {k: copy_state(v) for k, v in self.__dict__.items() if k not in self._state_excluded_attrs}
+        return EnvState(
+            grid=self.grid.get_state(),
+            obs=obs,
+            ruleset=self._ruleset,
+            ruleset_state=self._ruleset.get_state(),
+            rules=tuple(self._rule_index.rules.items()),
+            attrs=MappingProxyType(attrs),
+            np_random_state=self.np_random.bit_generator.state,
+        )
+
+    def set_state(self, state: EnvState):
+        """
+        Restore a snapshot returned by get_state (the objects of the grid are not reconstructed)
+        """
+        # copy again so that the snapshot can be restored several times
+        self.__dict__.update({k: copy_state(v) for k, v in state.attrs.items()})
+        self.np_random.bit_generator.state = state.np_random_state
+        self.grid.set_state(state.grid)
+
+        # the objects of the snapshot refer to its ruleset
+        self._ruleset = state.ruleset
+        self._ruleset.set_state(state.ruleset_state)
+        self.grid._ruleset = self._ruleset
+        self._rule_index.rules = dict(state.rules)
+
+        if self._obs is not None and self._obs.shape == state.obs.shape:
+            self._obs[...] = state.obs
+        else:
+            self._obs = state.obs.copy()
+        self._obs_grid = self.grid
+
     def reset(self, *, seed=None, return_info=False, options=None):
+        profiler = self.profiler
+        if profiler is not None:
+            t_start = time.perf_counter()
+
+        self._reset(seed=seed, options=options)
+
+        if profiler is not None:
+            t = time.perf_counter()
+
+        # Return first observation
+        obs = self.gen_obs()
+
+        if profiler is not None:
+            profiler.lap('reset', 'gen_obs', t)
+            profiler.lap('reset', 'total', t_start)
+
+        if not return_info:
+            return obs
+        else:
+            return obs, {}
+
+    def _reset(self, *, seed=None, options=None):
+        """
+        Generate a new level (or load options['level']) and its rules without encoding the observation (see reset)
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            t = time.perf_counter()
+
         try:
             super().reset(seed=seed)
         except TypeError:
-            # gym==0.21 reset not implemented in gym.Env
-            pass
+            # gym==0.21 reset not implemented in gym.Env, and its seeding.np_random returns a legacy RandomState (the
+            # code of the env uses the Generator API)
+            if seed is not None or getattr(self, 'np_random', None) is None:
+                self.np_random = np.random.default_rng(seed)
+
+        self._hash_states.clear()
 
         # Current position and direction of the agent
         self.agent_pos = None
         self.agent_dir = None
 
-        # Generate a new random grid at the start of each episode
-        self._gen_grid(self.width, self.height)
+        # Generate a new random grid at the start of each episode, or load a pre-generated level (see level_bank.py)
+        level = None if options is None else options.get('level')
+        if level is None:
+            self._gen_grid(self.width, self.height)
+        else:
+            level.load(self)
+
+        if self.grid_backend == 'array' and not isinstance(self.grid, BabaIsYouArrayGrid):
+            self.grid = BabaIsYouArrayGrid.from_grid(self.grid)
+
+        if profiler is not None:
+            t = profiler.lap('reset', 'gen_grid', t)
 
         # Set the encoding level for the grid
         self.grid.encoding_level = self.encoding_level
 
         # Compute the ruleset for the generated grid
-        self._ruleset = extract_ruleset(self.grid, default_ruleset=self.default_ruleset)
+        self._rule_index = RuleIndex(self.grid, default_ruleset=self.default_ruleset)
+        self._ruleset = self._rule_index.get_ruleset()
 
         # make the ruleset accessible to all FlexibleWorlObj (not working for objects added after reset is called)
         # for e in self.grid:
@@ -439,7 +1136,14 @@ class BabaIsYouEnv(gym.Env):
                 if hasattr(e, "set_ruleset"):
                     e.set_ruleset(self._ruleset)
 
-        self.agent_pos = self.set_agent()
+        if profiler is not None:
+            t = profiler.lap('reset', 'extract_ruleset', t)
+
+        if level is None:
+            self.agent_pos = self.set_agent()
+
+        if profiler is not None:
+            t = profiler.lap('reset', 'set_agent', t)
 
         # These fields should be defined by _gen_grid
         assert self.agent_pos is not None
@@ -455,16 +1159,32 @@ class BabaIsYouEnv(gym.Env):
         # Step count since episode start
         self.step_count = 0
 
-        # Return first observation
-        obs = self.gen_obs()
-
-        if not return_info:
-            return obs
-        else:
-            return obs, {}
-
     def hash(self, size=16):
         """Compute a hash that uniquely identifies the current state of the environment.
+
+        The 64-bit Zobrist hash of the observation, agent position and direction is maintained incrementally, so that
+        the cost doesn't depend on the size of the grid. Use digest for sizes larger than 16 hex digits.
+        :param size: Size of the hashing
+        """
+        if size > 16:
+            return self.digest(size)
+
+        self._update_obs()
+        agent_pos = self.agent_pos
+        value = self._obs_hash ^ _splitmix64((1 << 32) + (int(agent_pos[0]) << 16) + (int(agent_pos[1]) << 2)
+                                             + int(self.agent_dir))
+
+        if self.check_hash_collisions:
+            state = (self._obs.tobytes(), int(agent_pos[0]), int(agent_pos[1]), int(self.agent_dir))
+            if self._hash_states.setdefault(value, state) != state:
+                # collision with a different state
+                return self.digest(size)
+
+        return format(value, "016x")[:size]
+
+    def digest(self, size=16):
+        """
+        SHA-256 digest of the encoding of the grid, agent position and direction
         :param size: Size of the hashing
         """
         sample_hash = hashlib.sha256()
@@ -521,13 +1241,47 @@ class BabaIsYouEnv(gym.Env):
 
         return 1 - 0.9 * (self.step_count / self.max_steps)
 
-    def place_obj(self, obj, top=None, size=None, reject_fn=None, max_tries=math.inf):
+    def _rand_int(self, low, high):
+        """
+        Generate random integer in [low,high[
+        """
+
+        return rand_int(low, high, self.np_random)
+
+    def _rand_elem(self, iterable):
+        """
+        Pick a random element in a list
+        """
+
+        lst = list(iterable)
+        idx = self._rand_int(0, len(lst))
+        return lst[idx]
+
+    def _rand_subset(self, iterable, num_elems):
+        """
+        Sample a random subset of distinct elements of a list
+        """
+
+        lst = list(iterable)
+        assert num_elems <= len(lst)
+
+        out = []
+
+        while len(out) < num_elems:
+            elem = self._rand_elem(lst)
+            lst.remove(elem)
+            out.append(elem)
+
+        return out
+
+    def place_obj(self, obj, top=None, size=None, reject_fn=None, max_tries=math.inf, valid_mask=None):
         """
         Place an object at an empty position in the grid
 
         :param top: top-left position of the rectangle where to place
         :param size: size of the rectangle where to place
         :param reject_fn: function to filter out potential positions
+        :param valid_mask: boolean array of shape (width, height) of the potential positions
         """
 
         if top is None:
@@ -538,33 +1292,38 @@ class BabaIsYouEnv(gym.Env):
         if size is None:
             size = (self.grid.width, self.grid.height)
 
+        # sample among the free cells of the rectangle instead of sampling positions until an empty one is found
+        x_max, y_max = min(top[0] + size[0], self.grid.width), min(top[1] + size[1], self.grid.height)
+        mask = np.zeros((self.grid.width, self.grid.height), dtype=bool)
+        mask[top[0]:x_max, top[1]:y_max] = self.grid.free_cells()[top[0]:x_max, top[1]:y_max]
+
+        # Don't place the object where the agent is
+        if self.agent_pos is not None:
+            mask[tuple(self.agent_pos)] = False
+
+        if valid_mask is not None:
+            mask &= valid_mask
+
+        # positions j * width + i of the candidate cells
+        candidates = np.flatnonzero(mask.T)
         num_tries = 0
 
         while True:
-            # This is to handle with rare cases where rejection sampling
-            # gets stuck in an infinite loop
-            if num_tries > max_tries:
+            # reject_fn can reject all the candidates
+            if num_tries > max_tries or len(candidates) == 0:
                 raise RecursionError("rejection sampling failed in place_obj")
 
             num_tries += 1
 
-            pos = np.array(
-                (
-                    rand_int(top[0], min(top[0] + size[0], self.grid.width)),
-                    rand_int(top[1], min(top[1] + size[1], self.grid.height)),
-                )
-            )
-
-            # Don't place the object on top of another object
-            if self.grid.get(*pos) is not None:
-                continue
-
-            # Don't place the object where the agent is
-            if np.array_equal(pos, self.agent_pos):
-                continue
+            idx = self._rand_int(0, len(candidates))
+            k = candidates[idx]
+            pos = np.array((k % self.grid.width, k // self.grid.width))
 
             # Check if there is a filtering criterion
             if reject_fn and reject_fn(self, pos):
+                # sample without replacement
+                candidates[idx] = candidates[-1]
+                candidates = candidates[:-1]
                 continue
 
             break
@@ -593,12 +1352,13 @@ class BabaIsYouEnv(gym.Env):
         """
         # TODO: clean
         pos = None
-        for k, e in enumerate(self.grid):
-            if e is not None and e.is_agent():
-                pos = (k % self.grid.width, k // self.grid.width)
-                self.agent_pos = pos
-                self.agent_dir = e.dir
-                break
+        agents = self.grid.get_index('is_agent')
+        if len(agents) > 0:
+            # first agent in row-major order
+            k = min(agents)
+            pos = (k % self.grid.width, k // self.grid.width)
+            self.agent_pos = pos
+            self.agent_dir = self.grid.get(*pos).dir
 
         if pos is None:
             # no agent in the env
@@ -614,7 +1374,7 @@ class BabaIsYouEnv(gym.Env):
         self.agent_pos = pos
 
         if rand_dir:
-            self.agent_dir = rand_int(0, 4)
+            self.agent_dir = self._rand_int(0, 4)
 
         return pos
 
@@ -647,20 +1407,21 @@ class BabaIsYouEnv(gym.Env):
 
     def change_obj_pos(self, pos, new_pos, mvt_dir=None):
         """
-        Change the position and the direction of an object in the grid
+        Change the position and the direction (index in DIR_TO_VEC) of an object in the grid
         """
-        if np.any(pos != new_pos):
+        if pos[0] != new_pos[0] or pos[1] != new_pos[1]:
             # move the object
             e = self.grid.get(*pos)
 
             if e is None:
                 return
 
-            self.grid.set(*new_pos, e)
-            self.grid.set(*pos, None)
             # change the dir of the object
             if mvt_dir is not None:
-                e.dir = np.argwhere(np.all(DIR_TO_VEC == mvt_dir, axis=1))[0][0]
+                e.dir = mvt_dir
+
+            self.grid.set(*new_pos, e)
+            self.grid.set(*pos, None)
 
     def is_win_pos(self, pos):
         new_cell = self.grid.get(*pos)
@@ -670,18 +1431,22 @@ class BabaIsYouEnv(gym.Env):
         new_cell = self.grid.get(*pos)
         return new_cell is not None and new_cell.is_defeat()
 
-    def try_open_shut(self, pos, new_pos):
+    @staticmethod
+    def is_open_shut(obj, fwd_obj):
         """
-        Check if an open is moving towards a shut obj or vice versa, if so destroy the objects
+        Check if an open obj is moving towards a shut obj or vice versa
         """
-        obj = self.grid.get(*pos)
-        fwd_obj = self.grid.get(*new_pos)
-
         def is_prop(obj, prop):
             return obj is not None and hasattr(obj, prop) and getattr(obj, prop)()
 
-        if (is_prop(obj, 'is_open') and is_prop(fwd_obj, 'is_shut')) or \
-                (is_prop(obj, 'is_shut') and is_prop(fwd_obj, 'is_open')):
+        return (is_prop(obj, 'is_open') and is_prop(fwd_obj, 'is_shut')) or \
+            (is_prop(obj, 'is_shut') and is_prop(fwd_obj, 'is_open'))
+
+    def try_open_shut(self, pos, new_pos):
+        """
+        Check if an open is moving towards a shut obj or vice versa, if so destroy the objects
+        """
+        if self.is_open_shut(self.grid.get(*pos), self.grid.get(*new_pos)):
             # destroy both objects
             self.grid.pop(*pos)
             self.grid.pop(*new_pos)
@@ -702,50 +1467,86 @@ class BabaIsYouEnv(gym.Env):
         #     self.grid.pop(*pos, max(z_shut, z_open))
         #     self.grid.pop(*pos, min(z_shut, z_open))
 
-    def move(self, pos, dir_vec):
+    def move(self, pos, dir):
         """
-        Return fwd_pos if can move, otherwise return pos
+        Move the object at pos in the direction dir (index in DIR_TO_VEC), pushing the line of pushable objects in front
+        of it and pulling the pullable objects behind it.
+        Return the new position of the object (pos if it is blocked) and if it is on a win or lose cell
         """
         # TODO: win only if the agent is on a winning block? Win and lose rules apply only to the agent, not to the pushed objects
         # if the agent pushes an obj on a winning block, win the game but if it is a losing block, just destroy the obj
-        # is_obj_win = False
+        grid = self.grid
+        dx, dy = DIR_TO_DELTA[dir]
+        x, y = int(pos[0]), int(pos[1])
+        result = None
 
-        fwd_pos = pos + dir_vec
-        fwd_cell = self.grid.get(*fwd_pos)
+        # each iteration moves a line of pushed objects, and continues with the line of the object pulled behind it
+        while True:
+            # collect the line of pushable objects in front of the object
+            line = [(x, y)]
+            cell = grid.get(x, y)
+            while True:
+                fwd_cell = grid.get(x + dx, y + dy)
+                # check if pushing an open obj on a shut obj (TODO: same for melt and hot)
+                if cell is not None and fwd_cell is not None and self.is_open_shut(cell, fwd_cell):
+                    grid.pop(x, y)
+                    grid.pop(x + dx, y + dy)
+                # the push is decided on the forward obj before open/shut destroys it
+                if fwd_cell is None or not fwd_cell.is_push():
+                    break
+                x, y = x + dx, y + dy
+                line.append((x, y))
+                cell = grid.get(x, y)
+
+            # move the objects starting from the end of the line, each one into the cell freed by the next one. The
+            # object pulled behind an object of the line is the previous object of the line, moved by the line itself
+            for k in range(len(line) - 1, -1, -1):
+                x, y = line[k]
+                # move if the fwd cell is empty or can overlap
+                fwd_cell = grid.get(x + dx, y + dy)
+                if fwd_cell is None or fwd_cell.can_overlap():
+                    new_pos = (x + dx, y + dy)
+                else:
+                    new_pos = (x, y)
 
-        # check if pushing an open obj on a shut obj (TODO: same for melt and hot)
-        self.try_open_shut(pos, fwd_pos)
+                # check if win or lose before moving the object that started the movement
+                if result is None and k == 0:
+                    result = new_pos, self.is_win_pos(new_pos), self.is_lose_pos(new_pos)
+                self.change_obj_pos((x, y), new_pos, dir)
 
-        # try to move the forward obj if it can be pushed
-        if fwd_cell is not None and fwd_cell.is_push():
-            # new_fwd_pos, is_obj_win, is_obj_lose = self.move(fwd_pos, dir_vec)
-            new_fwd_pos, _, _ = self.move(fwd_pos, dir_vec)
+            # pull the object in the cell behind the line (even if the line is blocked)
+            bwd_cell = grid.get(x - dx, y - dy)
+            if bwd_cell is None or not bwd_cell.is_pull():
+                return result
+            x, y = x - dx, y - dy
 
-        # move if the fwd cell is empty or can overlap
-        fwd_cell = self.grid.get(*fwd_pos)
-        if fwd_cell is None or fwd_cell.can_overlap():
-            new_pos = tuple(fwd_pos)
-        else:
-            new_pos = pos
+    def step(self, action):
+        profiler = self.profiler
+        if profiler is not None:
+            t_start = time.perf_counter()
 
-        # TODO: move the agent here (what is currently implemented) or just compute the mvts and execute them later?
+        reward, done = self._step(action)
 
-        # check if win or lose before moving the agent
-        is_win = self.is_win_pos(new_pos)
-        is_lose = self.is_lose_pos(new_pos)
-        self.change_obj_pos(pos, new_pos, dir_vec)
+        if profiler is not None:
+            t = time.perf_counter()
 
-        # pull object in the cell behind
-        bwd_pos = pos - dir_vec
-        bwd_cell = self.grid.get(*bwd_pos)
-        # the obj can be pulled if the agent has moved (i.e. new_pos = fwd_pos)
-        if bwd_cell is not None and bwd_cell.is_pull():
-            new_bwd_pos, _, _ = self.move(bwd_pos, dir_vec)
-            # self.change_obj_pos(bwd_pos, new_bwd_pos)
+        obs = self.gen_obs()
 
-        return new_pos, is_win, is_lose
+        if profiler is not None:
+            profiler.lap('step', 'gen_obs', t)
+            profiler.lap('step', 'total', t_start)
+
+        return obs, reward, done, {}
+
+    def _step(self, action):
+        """
+        Apply the action to the grid and the rules without encoding the observation (the modified cells are in
+        grid.dirty), return the reward and done
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            t = time.perf_counter()
 
-    def step(self, action):
         self.step_count += 1
 
         is_win, is_lose = False, False
@@ -770,53 +1571,67 @@ class BabaIsYouEnv(gym.Env):
             # move the agent if the forward cell is empty or can overlap or can be pushed
             # self.agent_pos, is_win, is_lose = self.move(self.agent_pos, self.dir_vec)
 
-            for k, e in enumerate(self.grid):
-                if e is not None and (e.is_agent() or e.is_move()):
-                    e.has_moved = False
+            # only iterate over the indexed positions of the agents and moving objects instead of the whole grid
+            for k in self.grid.get_index('is_agent') | self.grid.get_index('is_move'):
+                self.grid.get(k % self.grid.width, k // self.grid.width).has_moved = False
 
             # TODO: stack objects if both agent and another character are pushing objects on the same cell at the same time
             # movements = []
             # the agent moves first
-            for k, e in enumerate(self.grid):
-                if e is not None and e.is_agent() and not e.has_moved:
-                    e.dir = self.agent_dir
-                    pos = (k % self.grid.width, k // self.grid.width)
-                    new_pos, is_win, is_lose = self.move(pos, self.dir_vec)
+            for pos in self.grid.iter_index('is_agent'):
+                e = self.grid.get(*pos)
+                if not e.has_moved:
+                    self.grid.set_dir(*pos, self.agent_dir)
+                    new_pos, is_win, is_lose = self.move(pos, self.agent_dir)
                     # movements.append((pos, new_pos))
                     e.has_moved = True
                     self.agent_pos = new_pos  # TODO: works when the agent is just one cell in the env
 
+            if profiler is not None:
+                t = profiler.lap('step', 'agent', t)
+
             # move other objects
-            for k, e in enumerate(self.grid):
-                if e is not None and e.is_move() and not e.has_moved:
-                    pos = (k % self.grid.width, k // self.grid.width)
-                    new_pos, _, _ = self.move(pos, DIR_TO_VEC[e.dir])
+            for pos in self.grid.iter_index('is_move'):
+                e = self.grid.get(*pos)
+                if not e.has_moved:
+                    new_pos, _, _ = self.move(pos, e.dir)
                     e.has_moved = True
 
             # TODO: handle conflicts
             # for (pos, new_pos) in movements:
             #     self.change_obj_pos(pos, new_pos)
 
+            if profiler is not None:
+                t = profiler.lap('step', 'is_move', t)
+
             # win/lose based on the rules active in the env
             self.is_win = is_win
             self.is_lose = is_lose
 
             reward, done = self.reward()
 
+            if profiler is not None:
+                t = profiler.lap('step', 'reward', t)
+
             # self._ruleset = extract_ruleset(self.grid, default_ruleset=self.default_ruleset)
-            self._ruleset.set(extract_ruleset(self.grid, default_ruleset=self.default_ruleset))
+            # only re-extract the rules around the rule blocks that have moved
+            if self._rule_index.update(self.grid):
+                self._ruleset.set(self._rule_index.get_ruleset())
+
+            if profiler is not None:
+                t = profiler.lap('step', 'extract_ruleset', t)
 
             # check if some bocks need to be replaced (obj1 is obj2 rules)
             for (obj1, obj2) in self._ruleset.get('replace', []):
                 self.grid.replace(obj1, obj2)
 
+            if profiler is not None:
+                t = profiler.lap('step', 'replace', t)
 
         if self.step_count >= self.max_steps:
             done = True
 
-        obs = self.gen_obs()
-
-        return obs, reward, done, {}
+        return reward, done
 
     def reward(self):
         if self.is_win:
@@ -830,8 +1645,37 @@ class BabaIsYouEnv(gym.Env):
             reward = 0
         return reward, done
 
+    def _update_obs(self):
+        """
+        Update the cached observation and its Zobrist hash, re-encoding only the cells modified since the last update
+        """
+        if self._obs is None or self._obs_grid is not self.grid \
+                or self._obs.shape[-1] != 3 * self.grid.encoding_level:
+            self._obs = self.grid.encode()
+            self._obs_grid = self.grid
+            self.grid.dirty.clear()
+            i, j = np.indices(self._obs.shape[:2])
+            self._obs_hash = int(np.bitwise_xor.reduce(zobrist_keys(i, j, self._obs), axis=None))
+
+        elif len(self.grid.dirty) > 0:
+            i, j = np.array(list(self.grid.dirty), dtype=int).T
+            # remove the keys of the previous encoding of the cells and add the keys of the new one
+            keys = zobrist_keys(i, j, self._obs[i, j])
+            self.grid.update_encoding(self._obs)
+            keys ^= zobrist_keys(i, j, self._obs[i, j])
+            self._obs_hash ^= int(np.bitwise_xor.reduce(keys))
+
     def gen_obs(self):
-        return self.grid.encode()
+        """
+        Encode the grid, re-encoding only the cells modified since the last observation
+        """
+        self._update_obs()
+
+        if self.readonly_obs:
+            obs = self._obs.view()
+            obs.flags.writeable = False
+            return obs
+        return self._obs.copy()
 
     def get_obs_render(self, obs, tile_size=TILE_PIXELS // 2):
         """
@@ -924,7 +1768,30 @@ def put_rule(env, obj: str, property: str, positions, color: str = None, is_push
         env.put_obj(RuleProperty(property, is_push=is_push), *positions[2])
 
 
-def place_rule(env, obj: str, property: str, color: str = None, is_push: bool = True, pos=None):
+def rule_pos_mask(free, n_blocks, vertical=False):
+    """
+    Boolean array of the positions of the first block of a rule of n_blocks blocks such that all the blocks are on free
+    cells and not on the last row or column of the grid
+
+    Args:
+        free: boolean array of shape (width, height) of the free cells
+        n_blocks: number of blocks of the rule
+        vertical: if the rule is placed vertically (from top to bottom) instead of horizontally
+    """
+    if vertical:
+        return rule_pos_mask(free.T, n_blocks).T
+
+    mask = np.zeros(free.shape, dtype=bool)
+    span = free.shape[0] - n_blocks
+    if span > 0:
+        mask[:span] = free[:span]
+        for i in range(1, n_blocks):
+            mask[:span] &= free[i:i + span]
+    return mask
+
+
+def place_rule(env, obj: str, property: str, color: str = None, is_push: bool = True, pos=None,
+               vertical: bool = False):
     """
     Args:
         env:
@@ -932,26 +1799,18 @@ def place_rule(env, obj: str, property: str, color: str = None, is_push: bool =
         property:
         color:
         is_push:
-        pos: position of the leftmost block
+        pos: position of the leftmost (topmost if vertical) block
+        vertical: place the rule vertically
     """
-    # TODO: vertical rules
     n_blocks = 3 if color is None else 4
 
-    def _is_invalid_rule_pos(env, pos):
-        # pos: list of positions for each block of the rule
-        # check if a rule can be placed horizontally starting from pos
-        is_inside_grid = pos[0] < env.width-n_blocks
-        if not is_inside_grid:
-            return True
-
+    if pos is None:
+        # sample the pos of the first rule block among the positions where all the blocks are on free cells
+        pos = env.place_obj(None, valid_mask=rule_pos_mask(env.grid.free_cells(), n_blocks, vertical))
+    if vertical:
+        positions = [(pos[0], pos[1]+i) for i in range(n_blocks)]
+    else:
         positions = [(pos[0]+i, pos[1]) for i in range(n_blocks)]
-        is_empty = all([env.grid.get(*p) is None for p in positions])
-        return not is_empty
 
-    if pos is None:
-        # sample the pos of the leftmost rule block
-        pos = env.place_obj(None, reject_fn=_is_invalid_rule_pos)
-    positions = [(pos[0]+i, pos[1]) for i in range(n_blocks)]
-    
     put_rule(env, obj, property, positions, color=color, is_push=is_push)
     return positions
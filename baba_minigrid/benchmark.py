@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Benchmark the BabaIsYou envs registered by register_minigrid_envs: reset latency, step throughput with a random
+policy, cost of gen_obs, extract_ruleset and render('rgb_array'), for several grid sizes and encoding levels.
+
+Compare the step throughput of BabaIsYouVecEnv to a loop over the same number of envs (--vec_num_envs), and of
+BabaIsYouSubprocVecEnv to a subprocess vector env of scalar envs sending the observations through pipes
+(--subproc_num_envs).
+
+Save the results and compare them to a baseline saved by a previous run (exit code 1 if a metric regressed):
+    python -m baba_minigrid.benchmark --out baseline.json
+    python -m baba_minigrid.benchmark --baseline baseline.json --out results.json
+"""
+
+import argparse
+import inspect
+import json
+import multiprocessing as mp
+import platform
+import subprocess
+import sys
+import time
+
+import gym
+import numpy as np
+from gym.vector.utils import CloudpickleWrapper
+
+from baba_minigrid import register_minigrid_envs
+from baba_minigrid.babaisyou import BabaIsYouGrid
+from baba_minigrid.flexible_world_object import make_obj, make_prop_fn, objects, properties
+from baba_minigrid.rule import extract_ruleset
+from baba_minigrid.vector_env import BabaIsYouSubprocVecEnv, BabaIsYouVecEnv
+
+# metrics measured for each env, and if higher values are better
+METRICS = {
+    "reset_ms": False,
+    "steps_per_s": True,
+    "gen_obs_ms": False,
+    "extract_ruleset_ms": False,
+    "render_ms": False,
+}
+
+
+def benchmark_level_construction(size, num_levels, rebind_properties=False):
+    """
+    Average time (ms) to build a size x size grid with an object in every cell. If rebind_properties, also create and
+    bind the property methods for every object like FlexibleWorldObj.__init__ used to (bound to a throwaway class
+    instead of the class of the object, to leave the classes unchanged), to compare with the cost before they were
+    bound once at import.
+    """
+    rebound_cls = type("RebindProperties", (), {})
+    t0 = time.perf_counter()
+    for _ in range(num_levels):
+        grid = BabaIsYouGrid(size, size)
+        for j in range(size):
+            for i in range(size):
+                grid.set(i, j, make_obj(objects[(i + j) % len(objects)]))
+                if rebind_properties:
+                    for prop in properties:
+                        setattr(rebound_cls, prop, make_prop_fn(prop))
+    t1 = time.perf_counter()
+    return 1000 * (t1 - t0) / num_levels
+
+
+def benchmark_import(module, repeat=5):
+    """
+    Best time (ms) to import the module in a new python process
+    """
+    code = "import time; t0 = time.perf_counter(); import {}; print(time.perf_counter() - t0)".format(module)
+    times = [
+        float(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout)
+        for _ in range(repeat)
+    ]
+    return 1000 * min(times)
+
+
+def _timeit(fn, number, repeat):
+    """
+    Best average time (ms) of fn over repeat runs of number calls (the other runs being slowed down by noise)
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return 1000 * min(times)
+
+
+def size_kwargs(env_name, size):
+    """
+    Kwargs to make the env with a grid of size x size, None if the env doesn't have a size argument (or width and
+    height arguments)
+    """
+    env_cls = gym.envs.registration.load(gym.envs.registry[env_name].entry_point)
+    params = inspect.signature(env_cls.__init__).parameters
+    if "size" in params:
+        return {"size": size}
+    elif "width" in params and "height" in params:
+        return {"width": size, "height": size}
+    return None
+
+
+def make_env(env_name, size=None, encoding_level=1):
+    """
+    Make the env with its default size if size is None
+    """
+    kwargs = {"encoding_level": encoding_level}
+    if size is not None:
+        kwargs.update(size_kwargs(env_name, size))
+    return gym.make(env_name, disable_env_checker=True, **kwargs)
+
+
+def benchmark_env(env_name, size=None, encoding_level=1, num_steps=1000, num_calls=100, repeat=3, seed=0):
+    """
+    Return a dict of the metrics of the env
+    """
+    env = make_env(env_name, size, encoding_level)
+    unwrapped = env.unwrapped
+    env.reset(seed=seed)
+    rng = np.random.RandomState(seed)
+    actions = rng.randint(env.action_space.n, size=num_steps)
+
+    def rollout():
+        for action in actions:
+            _, _, done, _ = env.step(action)
+            if done:
+                env.reset()
+
+    def gen_obs():
+        # re-encode every cell
+        unwrapped.grid.mark_all_dirty()
+        unwrapped.gen_obs()
+
+    results = {
+        "reset_ms": _timeit(env.reset, num_calls, repeat),
+        "steps_per_s": 1000 * num_steps / _timeit(rollout, 1, repeat),
+        "gen_obs_ms": _timeit(gen_obs, num_calls, repeat),
+        "extract_ruleset_ms": _timeit(lambda: extract_ruleset(unwrapped.grid), num_calls, repeat),
+        "render_ms": _timeit(lambda: env.render("rgb_array"), num_calls, repeat),
+    }
+    env.close()
+    return results
+
+
+def benchmark_vec_env(env_name, num_envs, num_steps=200, repeat=3, seed=0):
+    """
+    Return the throughput (steps per second, summed over the envs) of BabaIsYouVecEnv and of a loop stepping num_envs
+    scalar envs with the same random actions, as a dict (vec_steps_per_s, loop_steps_per_s)
+    """
+    def env_fn():
+        return make_env(env_name).unwrapped
+
+    vec_env = BabaIsYouVecEnv([env_fn] * num_envs, copy=False)
+    vec_env.reset(seed=seed)
+    envs = [env_fn() for _ in range(num_envs)]
+    for n, env in enumerate(envs):
+        env.reset(seed=seed + n)
+    rng = np.random.RandomState(seed)
+    actions = rng.randint(vec_env.action_space.n, size=(num_steps, num_envs))
+
+    def vec_rollout():
+        for step_actions in actions:
+            vec_env.step(step_actions)
+
+    def loop_rollout():
+        for step_actions in actions:
+            for env, action in zip(envs, step_actions):
+                _, _, done, _ = env.step(action)
+                if done:
+                    env.reset()
+
+    results = {
+        "vec_steps_per_s": 1000 * num_steps * num_envs / _timeit(vec_rollout, 1, repeat),
+        "loop_steps_per_s": 1000 * num_steps * num_envs / _timeit(loop_rollout, 1, repeat),
+    }
+    vec_env.close()
+    for env in envs:
+        env.close()
+    return results
+
+
+def _pipe_worker(remote, parent_remote, env_fn):
+    parent_remote.close()
+    env = env_fn.fn()
+    while True:
+        cmd, data = remote.recv()
+        if cmd == "step":
+            observation, reward, done, info = env.step(data)
+            if done:
+                info["terminal_observation"] = observation
+                observation = env.reset()
+            remote.send((observation, reward, done, info))
+        elif cmd == "reset":
+            remote.send(env.reset(seed=data))
+        elif cmd == "close":
+            env.close()
+            remote.close()
+            break
+
+
+class PipeVecEnv:
+    """
+    Subprocess vector env with one scalar env per process, sending the observations through the pipes (like the
+    SubprocVecEnv of stable-baselines3), the baseline of BabaIsYouSubprocVecEnv
+    """
+
+    def __init__(self, env_fns):
+        self.num_envs = len(env_fns)
+        ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+        self.remotes, self.processes = [], []
+        for env_fn in env_fns:
+            remote, work_remote = ctx.Pipe()
+            process = ctx.Process(target=_pipe_worker, args=(work_remote, remote, CloudpickleWrapper(env_fn)),
+                                  daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+    def reset(self, seed=None):
+        for n, remote in enumerate(self.remotes):
+            remote.send(("reset", None if seed is None else seed + n))
+        return np.stack([remote.recv() for remote in self.remotes])
+
+    def step(self, actions):
+        for remote, action in zip(self.remotes, actions):
+            remote.send(("step", action))
+        observations, rewards, dones, infos = zip(*[remote.recv() for remote in self.remotes])
+        return np.stack(observations), np.array(rewards), np.array(dones), list(infos)
+
+    def close(self):
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+
+
+def benchmark_subproc_vec_env(env_name, num_envs, envs_per_worker=1, num_steps=200, repeat=3, seed=0):
+    """
+    Return the throughput (steps per second, summed over the envs) of BabaIsYouSubprocVecEnv with scalar workers, with
+    BabaIsYouVecEnv workers, and of PipeVecEnv, as a dict (subproc_steps_per_s, subproc_vectorize_steps_per_s,
+    pipe_steps_per_s)
+    """
+    def env_fn():
+        return make_env(env_name).unwrapped
+
+    rng = np.random.RandomState(seed)
+    actions = rng.randint(env_fn().action_space.n, size=(num_steps, num_envs))
+
+    def throughput(vec_env):
+        vec_env.reset(seed=seed)
+
+        def rollout():
+            for step_actions in actions:
+                vec_env.step(step_actions)
+
+        try:
+            return 1000 * num_steps * num_envs / _timeit(rollout, 1, repeat)
+        finally:
+            vec_env.close()
+
+    return {
+        "subproc_steps_per_s": throughput(
+            BabaIsYouSubprocVecEnv([env_fn] * num_envs, envs_per_worker=envs_per_worker, copy=False)
+        ),
+        "subproc_vectorize_steps_per_s": throughput(
+            BabaIsYouSubprocVecEnv([env_fn] * num_envs, envs_per_worker=envs_per_worker, copy=False, vectorize=True)
+        ),
+        "pipe_steps_per_s": throughput(PipeVecEnv([env_fn] * num_envs)),
+    }
+
+
+def register_envs():
+    if "BabaIsYou-GoToObj-v0" not in gym.envs.registry:
+        register_minigrid_envs()
+
+
+def babaisyou_env_names():
+    register_envs()
+    return [env_name for env_name in gym.envs.registry if env_name.startswith("BabaIsYou-")]
+
+
+def run_benchmarks(env_names, sizes=(None,), encoding_levels=(1,), **kwargs):
+    """
+    Benchmark each env for each size (None for the default size, skipped if the env doesn't have a size argument) and
+    encoding level, return a list of dicts (env, size, encoding_level, metrics or error if the env failed)
+    """
+    register_envs()
+    results = []
+    for env_name in env_names:
+        for size in sizes:
+            if size is not None and size_kwargs(env_name, size) is None:
+                continue
+            for encoding_level in encoding_levels:
+                result = {"env": env_name, "size": size, "encoding_level": encoding_level}
+                try:
+                    result.update(benchmark_env(env_name, size, encoding_level, **kwargs))
+                except Exception as e:
+                    result["error"] = "{}: {}".format(type(e).__name__, e)
+                results.append(result)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Return the metrics worse than in the baseline by more than the relative tolerance, as a list of tuples
+    (env, size, encoding_level, metric, baseline value, value)
+    """
+    def key(result):
+        return result["env"], result["size"], result["encoding_level"]
+
+    baseline = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = baseline.get(key(result))
+        if base is None:
+            continue
+        if "error" in result and "error" not in base:
+            # the env doesn't work anymore
+            regressions.append((*key(result), "error", None, result["error"]))
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or metric not in base:
+                continue
+            value, base_value = result[metric], base[metric]
+            if higher_is_better:
+                regressed = value < base_value * (1 - tolerance)
+            else:
+                regressed = value > base_value * (1 + tolerance)
+            if regressed:
+                regressions.append((*key(result), metric, base_value, value))
+    return regressions
+
+
+def compare_import_times(import_times, baseline, tolerance=0.2):
+    """
+    Return the modules slower to import than in the baseline by more than the relative tolerance, as a list of tuples
+    (module, baseline time, time)
+    """
+    return [
+        (module, baseline[module], t) for module, t in import_times.items()
+        if module in baseline and t > baseline[module] * (1 + tolerance)
+    ]
+
+
+def print_results(results):
+    header = ["env", "size", "level", *METRICS]
+    print(" ".join(["{:<28}".format(header[0]), "{:>4} {:>5}".format(*header[1:3])]
+                   + ["{:>18}".format(metric) for metric in METRICS]))
+    for result in results:
+        row = ["{:<28}".format(result["env"]), "{:>4} {:>5}".format(str(result["size"] or "-"),
+                                                                  result["encoding_level"])]
+        if "error" in result:
+            row.append(result["error"])
+        else:
+            row += ["{:>18.3f}".format(result[metric]) for metric in METRICS]
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--env-name",
+        dest="env_name",
+        nargs="+",
+        help="gym environments to benchmark (all the BabaIsYou envs by default)",
+        default=None,
+    )
+    parser.add_argument("--sizes", type=lambda size: None if size == "default" else int(size), nargs="+",
+                        default=[None], help="grid sizes, 'default' for the default size of the envs")
+    parser.add_argument("--encoding_levels", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--num_steps", type=int, default=1000)
+    parser.add_argument("--num_calls", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--vec_num_envs", type=int, nargs="*", default=[],
+                        help="numbers of envs of the comparison of BabaIsYouVecEnv to a loop over the envs")
+    parser.add_argument("--subproc_num_envs", type=int, nargs="*", default=[],
+                        help="numbers of envs of the comparison of BabaIsYouSubprocVecEnv to PipeVecEnv")
+    parser.add_argument("--envs_per_worker", type=int, default=1)
+    parser.add_argument("--num_levels", type=int, default=20)
+    parser.add_argument("--level_size", type=int, default=30)
+    parser.add_argument("--import_modules", nargs="*", default=["baba_minigrid", "baba_minigrid.envs.babaisyou"],
+                        help="modules whose import time is measured")
+    parser.add_argument("--out", help="json file where to save the results")
+    parser.add_argument("--baseline", help="json file of the results to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative tolerance of the comparison")
+    args = parser.parse_args()
+
+    env_names = babaisyou_env_names() if args.env_name is None else args.env_name
+    results = run_benchmarks(env_names, args.sizes, args.encoding_levels, num_steps=args.num_steps,
+                             num_calls=args.num_calls, repeat=args.repeat)
+    construction_time = benchmark_level_construction(args.level_size, args.num_levels)
+    rebind_construction_time = benchmark_level_construction(args.level_size, args.num_levels, rebind_properties=True)
+    import_times = {module: benchmark_import(module, args.repeat) for module in args.import_modules}
+
+    print_results(results)
+    print(f"level construction time ({args.level_size}x{args.level_size}): {construction_time:.2f} ms "
+          f"({rebind_construction_time:.2f} ms when binding the property methods for every object)")
+    for module, import_time in import_times.items():
+        print(f"import {module}: {import_time:.1f} ms")
+    vec_results = []
+    for env_name in env_names:
+        for num_envs in args.vec_num_envs:
+            result = benchmark_vec_env(env_name, num_envs, args.num_steps // num_envs or 1, args.repeat)
+            vec_results.append({"env": env_name, "num_envs": num_envs, **result})
+            print(f"{env_name} x{num_envs}: BabaIsYouVecEnv {result['vec_steps_per_s']:.0f} steps/s, "
+                  f"loop {result['loop_steps_per_s']:.0f} steps/s")
+    subproc_results = []
+    for env_name in env_names:
+        for num_envs in args.subproc_num_envs:
+            result = benchmark_subproc_vec_env(env_name, num_envs, args.envs_per_worker,
+                                               args.num_steps // num_envs or 1, args.repeat)
+            subproc_results.append({"env": env_name, "num_envs": num_envs, **result})
+            print(f"{env_name} x{num_envs}: BabaIsYouSubprocVecEnv {result['subproc_steps_per_s']:.0f} steps/s "
+                  f"({result['subproc_vectorize_steps_per_s']:.0f} with BabaIsYouVecEnv workers), "
+                  f"PipeVecEnv {result['pipe_steps_per_s']:.0f} steps/s")
+
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump({
+                "python": sys.version,
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "level_construction_ms": construction_time,
+                "rebind_level_construction_ms": rebind_construction_time,
+                "import_ms": import_times,
+                "results": results,
+                "vec_results": vec_results,
+                "subproc_results": subproc_results,
+            }, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline["results"], args.tolerance)
+        for env_name, size, encoding_level, metric, base_value, value in regressions:
+            if metric == "error":
+                print(f"regression: {env_name} size={size} encoding_level={encoding_level} {value}")
+            else:
+                print(f"regression: {env_name} size={size} encoding_level={encoding_level} {metric}: "
+                      f"{base_value:.3f} -> {value:.3f}")
+        import_regressions = compare_import_times(import_times, baseline.get("import_ms", {}), args.tolerance)
+        for module, base_value, value in import_regressions:
+            print(f"regression: import {module}: {base_value:.1f} -> {value:.1f} ms")
+        if len(regressions) + len(import_regressions) > 0:
+            sys.exit(1)
+        print("no regression")
@@ -87,7 +87,7 @@ class TestRuleEnv(BabaIsYouEnv):
         self.put_obj(RuleIs(), 3, 2)
         self.put_obj(RuleProperty('is_agent'), 4, 2)
 
-        positions = grid_random_position(self.size, n_samples=len(self.blocks), margin=3)
+        positions = grid_random_position(self.size, n_samples=len(self.blocks), margin=3, np_random=self.np_random)
 
         for pos, block in zip(positions, self.blocks):
             self.put_obj(block, *pos)
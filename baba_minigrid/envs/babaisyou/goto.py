@@ -30,8 +30,8 @@ class BaseGridEnv(BabaIsYouEnv):
         self.put_obj(RuleProperty(property, is_push=is_push), *positions[2])
 
 
-def random_rule_pos(size, margin):
-    rule_pos = grid_random_position(size, n_samples=1, margin=margin)[0]
+def random_rule_pos(size, margin, np_random=None):
+    rule_pos = grid_random_position(size, n_samples=1, margin=margin, np_random=np_random)[0]
     rule_pos = [(rule_pos[0]-1, rule_pos[1]), rule_pos, (rule_pos[0]+1, rule_pos[1])]
     return rule_pos
 
@@ -74,15 +74,17 @@ class GoToObjEnv(BaseGridEnv):
         # rule blocks position
         if self.rdm_rule_pos:
             # self.rule_pos = random_position(self.size, n_samples=3, margin=3)
-            self.rule_pos = random_rule_pos(self.size, margin=2)
+            self.rule_pos = random_rule_pos(self.size, margin=2, np_random=self.np_random)
         else:
             # self.rule_pos = [(2, 2), (3, 2), (4, 2)]
             self.rule_pos = [(1, 2), (2, 2), (3, 2)]
 
         # agent and ball positions
-        agent_start_pos, self.ball_pos = grid_random_position(self.size, n_samples=2, margin=1)
+        agent_start_pos, self.ball_pos = grid_random_position(self.size, n_samples=2, margin=1, np_random=self.np_random)
         while agent_start_pos in self.rule_pos or self.ball_pos in self.rule_pos:
-            agent_start_pos, self.ball_pos = grid_random_position(self.size, n_samples=2, margin=1)
+            agent_start_pos, self.ball_pos = grid_random_position(
+                self.size, n_samples=2, margin=1, np_random=self.np_random
+            )
 
         self.agent_start_pos = agent_start_pos
 
@@ -190,7 +192,7 @@ class GoToWinObjEnv(BaseGridEnv):
         self.rule2_pos = [(1, 2), (2, 2), (3, 2)]
 
         # randomly sample the rules
-        self.rule_idx = rule_idx = np.random.choice(len(self.rules))
+        self.rule_idx = rule_idx = self._rand_int(0, len(self.rules))
         ball_property = self.rules[rule_idx]['fball']
         wall_property = self.rules[rule_idx]['fwall']
 
@@ -202,15 +204,15 @@ class GoToWinObjEnv(BaseGridEnv):
         # wall_pos, ball_pos = grid_random_position(self.size, n_samples=2, margin=1,
         #                                           exclude_pos=[*self.rule1_pos, *self.rule2_pos])
 
-        n_walls = np.random.choice(self.n_walls) if isinstance(self.n_walls, list) else self.n_walls
-        n_balls = np.random.choice(self.n_balls) if isinstance(self.n_balls, list) else self.n_balls
+        n_walls = self._rand_elem(self.n_walls) if isinstance(self.n_walls, list) else self.n_walls
+        n_balls = self._rand_elem(self.n_balls) if isinstance(self.n_balls, list) else self.n_balls
 
         if not self.rdm_pos:
             positions = [(1, 4), (3, 4)]
             if not self.rdm_obj:
                 wall_pos_idx, ball_pos_idx = 0, 1
             else:
-                wall_pos_idx, ball_pos_idx = np.random.choice(2, replace=False, size=2)
+                wall_pos_idx, ball_pos_idx = self._rand_subset(range(2), 2)
             wall_pos = positions[wall_pos_idx]
             ball_pos = positions[ball_pos_idx]
             baba_pos = (2, 4)
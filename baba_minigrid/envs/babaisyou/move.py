@@ -1,6 +1,6 @@
 import numpy as np
 
-from baba_minigrid import Wall
+from baba_minigrid.minigrid import Wall
 from baba_minigrid.babaisyou import BabaIsYouEnv, BabaIsYouGrid
 from baba_minigrid.flexible_world_object import RuleObject, RuleIs, RuleProperty, Baba, make_obj, \
     FDoor, FWall, FBall, FKey
@@ -26,7 +26,7 @@ class MoveObjEnv(BabaIsYouEnv):
         self.put_obj(RuleIs(), 2, 1)
         self.put_obj(RuleProperty('is_agent'), 3, 1)
 
-        idx = np.random.choice(range(len(self.goal_obj)))
+        idx = self._rand_int(0, len(self.goal_obj))
         sampled_obj_name, self.sampled_obj = self.goal_obj_name[idx], self.goal_obj[idx]
 
         self.put_obj(RuleObject(sampled_obj_name), 1, 2)
@@ -74,12 +74,12 @@ class OpenShutObjEnv(BabaIsYouEnv):
         self.grid.wall_rect(0, 0, width, height)
 
         # sample open and shut objects
-        open_obj_name = np.random.choice(list(self.open_objects.keys()))
+        open_obj_name = self._rand_elem(self.open_objects.keys())
         # ensure that shut obj is different from open obj
         shut_objects = dict(self.shut_objects)
         if open_obj_name in shut_objects:
             del shut_objects[open_obj_name]
-        shut_obj_name = np.random.choice(list(shut_objects.keys()))
+        shut_obj_name = self._rand_elem(shut_objects.keys())
 
         self.open_obj = self.open_objects[open_obj_name]
         self.shut_obj = self.shut_objects[shut_obj_name]
@@ -283,7 +283,7 @@ class FourRoomEnv(BabaIsYouEnv):
         rule_objects = ["baba", "fkey", "fdoor", "fkey"]
 
         def _permute(arr):
-            indices = np.random.choice(np.arange(len(arr)), size=len(arr), replace=False)
+            indices = self.np_random.permutation(len(arr))
             arr = np.array(arr)[indices]
             return arr
 
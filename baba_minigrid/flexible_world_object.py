@@ -2,7 +2,7 @@ import math
 
 import numpy as np
 
-from baba_minigrid.utils import add_img_text
+from baba_minigrid.utils import add_img_text, copy_state
 from baba_minigrid.minigrid import WorldObj, COLORS, OBJECT_TO_IDX, COLOR_TO_IDX
 from baba_minigrid.rendering import fill_coords, point_in_circle, point_in_rect, point_in_triangle, rotate_fn
 
@@ -96,18 +96,42 @@ def make_obj(name: str, color: str = None):
     return obj_cls(**kwargs)
 
 
+# Images of the text of the rule blocks, indexed by (name, size)
+glyph_cache = {}
+
+
+def get_glyph(name: str, size: int):
+    """
+    Return a read-only image of size x size pixels with the text name, rendered the first time it is requested and
+    shared by all the rule blocks
+    """
+    key = (name, size)
+    if key not in glyph_cache:
+        img = np.zeros((size, size, 3), np.uint8)
+        add_img_text(img, name)
+        img.flags.writeable = False
+        glyph_cache[key] = img
+    return glyph_cache[key]
+
+
 class RuleBlock(WorldObj):
     """
     By default, rule blocks can be pushed by the agent.
     """
+    __slots__ = ('name', '_is_push')
+
+    # margin (pixels) around the text
+    margin = 10
+
     def __init__(self, name, type, color, is_push=True):
         super().__init__(type, color)
         self._is_push = is_push
-        self.name = name = name_mapping.get(name, name)
-        self.margin = 10
-        img = np.zeros((96-2*self.margin, 96-2*self.margin, 3), np.uint8)
-        add_img_text(img, name)
-        self.img = img
+        self.name = name_mapping.get(name, name)
+
+    @property
+    def img(self):
+        # text image for the default tile size (TILE_PIXELS * 3 subdivisions)
+        return get_glyph(self.name, 96-2*self.margin)
 
     def can_overlap(self):
         return False
@@ -117,7 +141,7 @@ class RuleBlock(WorldObj):
 
     def render(self, img):
         fill_coords(img, point_in_rect(0.06, 0.94, 0.06, 0.94), [235, 235, 235])
-        img[self.margin:-self.margin, self.margin:-self.margin] = self.img
+        img[self.margin:-self.margin, self.margin:-self.margin] = get_glyph(self.name, img.shape[0]-2*self.margin)
 
     # TODO: different encodings of the rule blocks for the agent observation
     def encode(self):
@@ -127,6 +151,8 @@ class RuleBlock(WorldObj):
 
 
 class RuleObject(RuleBlock):
+    __slots__ = ('object',)
+
     def __init__(self, obj, is_push=True):
         obj = name_mapping_inverted[obj] if obj not in objects else obj
         # TODO: red push is win (push is a rule_obj but not in objects)
@@ -137,6 +163,8 @@ class RuleObject(RuleBlock):
 
 
 class RuleProperty(RuleBlock):
+    __slots__ = ('property',)
+
     def __init__(self, property, is_push=True):
         property = name_mapping_inverted[property] if property not in properties else property
         assert property in properties, "{} not in {}".format(property, properties)
@@ -146,11 +174,15 @@ class RuleProperty(RuleBlock):
 
 
 class RuleIs(RuleBlock):
+    __slots__ = ()
+
     def __init__(self, is_push=True):
         super().__init__('is', 'rule_is', 'purple', is_push=is_push)
 
 
 class RuleColor(RuleBlock):
+    __slots__ = ('obj_color',)
+
     def __init__(self, obj_color, is_push=True):
         assert obj_color in COLOR_TO_IDX, "{} not in {}".format(obj_color, COLOR_TO_IDX)
 
@@ -162,18 +194,86 @@ class Ruleset:
     """
     Each object in the env has a reference to the ruleset object, which is automatically updated (would have to manually
     update it if were using a dict instead).
+
+    The ruleset dict is compiled into a boolean table indexed by (property, object type, color) every time it is set,
+    so that the properties of the objects are O(1) lookups. Call compile after modifying the dict in place. The table
+    is recompiled when an object type or a color registered after the compilation is looked up.
     """
     def __init__(self, ruleset_dict):
-        self.ruleset_dict = ruleset_dict
+        # incremented every time the ruleset changes
+        self.version = 0
+        self.set(ruleset_dict)
 
     def set(self, ruleset_dict):
         self.ruleset_dict = ruleset_dict
+        self.compile()
+
+    def compile(self):
+        """
+        Compile the ruleset dict into the table of properties
+        """
+        table = np.zeros((len(properties), len(OBJECT_TO_IDX), len(COLOR_TO_IDX)), dtype=bool)
+
+        for prop_idx, prop in enumerate(properties):
+            rules = self.ruleset_dict.get(prop, {})
+            implied_types = self._implied_types(prop)
+
+            for typ in rules.keys() | implied_types:
+                # skip the color keys and the object types set to False
+                if typ not in OBJECT_TO_IDX or not (rules.get(typ, False) or typ in implied_types):
+                    continue
+
+                # check for rules specific to a color e.g. {"is_goal": {"fball": True, "fball_color": [0]}}
+                color_set = rules.get(typ + "_color", [])
+                if len(color_set) == 0:
+                    table[prop_idx, OBJECT_TO_IDX[typ]] = True
+                else:
+                    table[prop_idx, OBJECT_TO_IDX[typ], [COLOR_TO_IDX[c] for c in color_set]] = True
+
+        self.table = table
+        # nested lists are faster than the array for single lookups
+        self._table_list = table.tolist()
+        self.version += 1
+
+    def _implied_types(self, prop):
+        """
+        Object types that have the property prop because of other rules
+        """
+        if prop != 'is_stop':
+            return set()
+        return {
+            typ for implying_prop in ['is_pull', 'is_agent']
+            for typ, value in self.ruleset_dict.get(implying_prop, {}).items() if value
+        }
+
+    def get_state(self):
+        # copy of the dict, which can be modified in place after the snapshot (the table is never modified in place)
+        return copy_state(self.ruleset_dict), self.table, self._table_list
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state without recompiling the ruleset
+        """
+        ruleset_dict, self.table, self._table_list = state
+        self.ruleset_dict = copy_state(ruleset_dict)
+        self.version += 1
+
+    def has_property(self, prop_idx, type_idx, color_idx):
+        try:
+            return self._table_list[prop_idx][type_idx][color_idx]
+        except IndexError:
+            # the type or the color was added to OBJECT_TO_IDX or COLOR_TO_IDX after the compilation
+            if self.table.shape[1:] == (len(OBJECT_TO_IDX), len(COLOR_TO_IDX)):
+                raise
+            self.compile()
+            return self._table_list[prop_idx][type_idx][color_idx]
 
     def __getitem__(self, item):
         return self.ruleset_dict[item]
 
     def __setitem__(self, key, value):
         self.ruleset_dict[key] = value
+        self.compile()
 
     def __str__(self):
         return f'Ruleset dict: {self.ruleset_dict}'
@@ -189,43 +289,32 @@ class Ruleset:
 
 def make_prop_fn(prop: str):
     """
-    Make a method that retrieves the property of an instance of FlexibleWorldObj in the ruleset
+    Make a method that retrieves the property of an instance of FlexibleWorldObj in the compiled ruleset
     """
+    prop_idx = properties.index(prop)
+
     def get_prop(self: FlexibleWorldObj):
         # retrieve the type and color specific to the instance 'self' (the function is the same for all instances)
-        typ = self.type
-        color = self.color
-        ruleset = self.get_ruleset()
-
-        # TODO: cleaner way to implement implicit rules? e.g. is_pull, is_agent implies is_stop
-        if prop == 'is_stop':
-            if ruleset['is_pull'].get(typ, False) or ruleset['is_agent'].get(typ, False):
-                ruleset['is_stop'][typ] = True
-
-        # check for rules specific to a color e.g. {"is_goal": {"fball": True, "fball_color": [0]}}
-        color_key = typ + "_color"
-        color_set = ruleset[prop].get(color_key, [])
-
-        if ruleset[prop].get(typ, False):  # object type set to True
-            # if no specified color or object fits color specifications
-            if (len(color_set) == 0) or (color in color_set):
-                return True
-        return False
+        kind = self.kind
+        return self._ruleset.has_property(prop_idx, kind.type_idx, kind.color_idx)
 
     return get_prop
 
 
 class FlexibleWorldObj(WorldObj):
+    __slots__ = ('_ruleset', 'has_moved')
+
     def __init__(self, type, color):
         assert type in objects, "{} not in {}".format(type, objects)
+        # the kind has the indices used to look up the properties in the compiled ruleset
         super().__init__(type, color)
-        self.name = name_mapping[type]  # pretty name
         # direction in which the object is facing
         self.dir = 0  # order: right, down, left, up
 
-        for prop in properties:
-            # create a method for each property and bind it to the class (same for all the instances of that class)
-            setattr(self.__class__, prop, make_prop_fn(prop))
+    @property
+    def name(self):
+        # pretty name, the same for all the objects of a type
+        return name_mapping[self.type]
 
     def set_ruleset(self, ruleset):
         self._ruleset = ruleset
@@ -238,7 +327,15 @@ class FlexibleWorldObj(WorldObj):
         return not self.is_stop()
 
 
+# create a method for each property and bind it to the class once (same for all the instances and subclasses)
+for prop in properties:
+    setattr(FlexibleWorldObj, prop, make_prop_fn(prop))
+del prop
+
+
 class FWall(FlexibleWorldObj):
+    __slots__ = ()
+
     def __init__(self, color="grey"):
         super().__init__("fwall", color)
 
@@ -247,6 +344,8 @@ class FWall(FlexibleWorldObj):
 
 
 class FBall(FlexibleWorldObj):
+    __slots__ = ()
+
     def __init__(self, color="green"):
         super().__init__("fball", color)
 
@@ -255,6 +354,8 @@ class FBall(FlexibleWorldObj):
 
 
 class FDoor(FlexibleWorldObj):
+    __slots__ = ()
+
     def __init__(self, color="red"):
         super().__init__("fdoor", color)
 
@@ -277,6 +378,8 @@ class FDoor(FlexibleWorldObj):
 
 
 class FKey(FlexibleWorldObj):
+    __slots__ = ()
+
     def __init__(self, color="blue"):
         super().__init__("fkey", color)
 
@@ -296,6 +399,8 @@ class FKey(FlexibleWorldObj):
 
 
 class Baba(FlexibleWorldObj):
+    __slots__ = ()
+
     def __init__(self, color="white"):
         super().__init__("baba", color)
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Bank of levels pre-generated with the _gen_grid of an env and stored in memory-mapped arrays, so that resetting an env
+to a level of the bank doesn't run _gen_grid, and all the processes reading the same bank share one copy of its pages.
+
+The bank is a directory with the files:
+    levels.npy: uint8 array (num_levels, width, height, max_stack, 4) of the (type, color, dir, flags) of the objects
+        stacked in each cell (same encoding as BabaIsYouArrayGrid)
+    agents.npy: int16 array (num_levels, 3) of the agent position and direction
+    seeds.npy: int64 array (num_levels,) of the seeds passed to reset to generate the levels
+    attrs.npy, attrs_offsets.npy: pickled attributes set by _gen_grid for each level (e.g. the sampled goal object), and
+        the offsets of each level in attrs.npy
+    meta.json: env id and kwargs, encoding of the object types and colors
+
+Generate a bank:
+    python -m baba_minigrid.level_bank --env-name BabaIsYou-FourRoomEnv-v0 --num_levels 1000000 --out levels/fourroom
+"""
+import argparse
+import json
+import os
+import pickle
+from functools import partial
+from multiprocessing import Pool
+from typing import NamedTuple
+
+import gym
+import numpy as np
+from gym import Wrapper
+
+from baba_minigrid import register_minigrid_envs
+from baba_minigrid.babaisyou import BabaIsYouArrayGrid, BabaIsYouGrid, OBJ_TYPE
+from baba_minigrid.minigrid import COLOR_TO_IDX, OBJECT_TO_IDX, WorldObj
+
+# attributes of the env that are not stored in the bank (the grid and the agent are stored in arrays)
+_excluded_attrs = {
+    'grid', 'agent_pos', 'agent_dir', '_obs', '_obs_grid', '_ruleset', '_rule_index', 'window', '_np_random',
+    'np_random',
+}
+
+
+def encode_level(grid, max_stack):
+    """
+    Array (width, height, max_stack, 4) of the objects stacked in each cell of the grid
+    """
+    if isinstance(grid, BabaIsYouArrayGrid):
+        if grid.stack_height.max() > max_stack:
+            raise ValueError("More than {} objects stacked in a cell".format(max_stack))
+        array = np.zeros((grid.width, grid.height, max_stack, 4), dtype=np.uint8)
+        array[..., OBJ_TYPE] = OBJECT_TO_IDX["empty"]
+        stack = min(max_stack, grid.max_stack)
+        array[:, :, :stack] = grid.array[:, :, :stack]
+        return array
+
+    return encode_level(BabaIsYouArrayGrid.from_grid(grid, max_stack=max_stack), max_stack)
+
+
+class Level(NamedTuple):
+    """
+    Level of a LevelBank, passed to BabaIsYouEnv.reset with options={'level': level}
+    """
+    array: np.ndarray
+    agent_pos: tuple
+    agent_dir: int
+    seed: int
+    # attributes set by _gen_grid
+    attrs: dict
+    # position (i, j, z) of the objects of the grid referred by attributes of the env: {(attr,): pos} or
+    # {(attr, key): pos} for the elements of lists and dicts
+    refs: dict
+
+    def load(self, env):
+        """
+        Set the grid, the agent and the attributes of the env to the ones of the level
+        """
+        grid_cls = BabaIsYouArrayGrid if env.grid_backend == 'array' else BabaIsYouGrid
+        env.grid = grid_cls.from_array(self.array)
+        env.agent_pos = self.agent_pos
+        env.agent_dir = self.agent_dir
+        for attr, value in self.attrs.items():
+            setattr(env, attr, value)
+
+        # rebind the references to the new objects of the grid (e.g. an object compared to the cells in env.reward)
+        for path, (i, j, z) in self.refs.items():
+            obj = env.grid.get(i, j, 'all')[z]
+            if len(path) == 1:
+                setattr(env, path[0], obj)
+                continue
+            attr, key = path
+            # copy the container that may be shared with the attributes of the level
+            container = getattr(env, attr)
+            if isinstance(container, dict):
+                container = {**container, key: obj}
+            else:
+                container = type(container)(obj if k == key else v for k, v in enumerate(container))
+            setattr(env, attr, container)
+
+
+def _object_refs(env):
+    """
+    Positions of the objects of the grid referred by attributes of the env
+    """
+    positions = {}
+    for i in range(env.grid.width):
+        for j in range(env.grid.height):
+            for z, obj in enumerate(env.grid.get(i, j, 'all')):
+                if obj is not None:
+                    positions[id(obj)] = (i, j, z)
+
+    refs = {}
+    for attr, value in env.__dict__.items():
+        if attr in _excluded_attrs:
+            continue
+        if isinstance(value, WorldObj):
+            items = [((attr,), value)]
+        elif isinstance(value, (list, tuple)):
+            items = [((attr, k), v) for k, v in enumerate(value)]
+        elif isinstance(value, dict):
+            items = [((attr, k), v) for k, v in value.items()]
+        else:
+            continue
+        for path, obj in items:
+            if isinstance(obj, WorldObj) and id(obj) in positions:
+                refs[path] = positions[id(obj)]
+    return refs
+
+
+def _gen_grid_recorder(env):
+    """
+    Return a view of env (object of a subclass of its class sharing its attributes, the class of env isn't modified)
+    and the set in which the view records the names of the attributes set through it, e.g. by its _gen_grid
+    """
+    class GenGridRecorder(type(env)):
+        def __setattr__(self, name, value):
+            recorded_attrs.add(name)
+            super().__setattr__(name, value)
+
+    recorded_attrs = set()
+    recorder = object.__new__(GenGridRecorder)
+    object.__setattr__(recorder, '__dict__', env.__dict__)
+    return recorder, recorded_attrs
+
+
+def make_env(env_id, env_kwargs):
+    if env_id not in gym.envs.registry:
+        register_minigrid_envs()
+    return gym.make(env_id, disable_env_checker=True, **env_kwargs).unwrapped
+
+
+def generate_levels(env, seeds, max_stack):
+    """
+    Generate the levels of the seeds with env
+    Return the arrays of the levels and of the agents, and the pickled attributes of each level
+    """
+    levels = np.zeros((len(seeds), env.width, env.height, max_stack, 4), dtype=np.uint8)
+    agents = np.zeros((len(seeds), 3), dtype=np.int16)
+    attrs = []
+
+    # run the _gen_grid of the class of env on the recorder during the resets
+    recorder, gen_grid_attrs = _gen_grid_recorder(env)
+    env._gen_grid = partial(type(env)._gen_grid, recorder)
+    try:
+        for n, seed in enumerate(seeds):
+            gen_grid_attrs.clear()
+            env.reset(seed=int(seed))
+            levels[n] = encode_level(env.grid, max_stack)
+            agents[n] = (*env.agent_pos, env.agent_dir)
+
+            refs = _object_refs(env)
+            level_attrs = {
+                attr: getattr(env, attr) for attr in gen_grid_attrs
+                if attr not in _excluded_attrs and (attr,) not in refs
+            }
+            attrs.append(pickle.dumps((level_attrs, refs)))
+    finally:
+        del env._gen_grid
+    return levels, agents, attrs
+
+
+def _generate_worker(args):
+    env_id, env_kwargs, seeds, max_stack = args
+    return generate_levels(make_env(env_id, env_kwargs), seeds, max_stack)
+
+
+def generate_level_bank(env_id, path, num_levels, seed=0, max_stack=2, num_workers=1, chunk_size=10000, **env_kwargs):
+    """
+    Generate the levels of the env env_id for the seeds seed, ..., seed + num_levels - 1 and save them in the directory
+    path
+
+    :param max_stack: max number of objects stacked in a cell (raises a ValueError if a level has more)
+    :param num_workers: number of processes generating the levels
+    """
+    os.makedirs(path, exist_ok=True)
+    env = make_env(env_id, env_kwargs)
+    shape = (num_levels, env.width, env.height, max_stack, 4)
+    levels = np.lib.format.open_memmap(os.path.join(path, 'levels.npy'), mode='w+', dtype=np.uint8, shape=shape)
+    agents = np.zeros((num_levels, 3), dtype=np.int16)
+    seeds = np.arange(seed, seed + num_levels, dtype=np.int64)
+
+    chunks = [
+        (env_id, env_kwargs, seeds[start:start + chunk_size], max_stack) for start in range(0, num_levels, chunk_size)
+    ]
+    offsets = [0]
+    with open(os.path.join(path, 'attrs.bin'), 'wb') as f:
+        with Pool(num_workers) as pool:
+            # the chunks are returned in order
+            for start, (chunk_levels, chunk_agents, chunk_attrs) in zip(
+                    range(0, num_levels, chunk_size), pool.imap(_generate_worker, chunks)):
+                levels[start:start + len(chunk_levels)] = chunk_levels
+                agents[start:start + len(chunk_agents)] = chunk_agents
+                for data in chunk_attrs:
+                    f.write(data)
+                    offsets.append(offsets[-1] + len(data))
+    levels.flush()
+    del levels
+
+    # store the bytes of the attributes as an npy array to memory-map them
+    attrs = np.fromfile(os.path.join(path, 'attrs.bin'), dtype=np.uint8)
+    np.save(os.path.join(path, 'attrs.npy'), attrs)
+    os.remove(os.path.join(path, 'attrs.bin'))
+    np.save(os.path.join(path, 'attrs_offsets.npy'), np.array(offsets, dtype=np.int64))
+    np.save(os.path.join(path, 'agents.npy'), agents)
+    np.save(os.path.join(path, 'seeds.npy'), seeds)
+
+    meta = {
+        'env_id': env_id,
+        'env_kwargs': env_kwargs,
+        'num_levels': num_levels,
+        'width': env.width,
+        'height': env.height,
+        'max_stack': max_stack,
+        'object_to_idx': OBJECT_TO_IDX,
+        'color_to_idx': COLOR_TO_IDX,
+    }
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return LevelBank(path)
+
+
+class LevelBank:
+    """
+    Levels saved by generate_level_bank, memory-mapped from the directory path
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta['object_to_idx'] != OBJECT_TO_IDX or self.meta['color_to_idx'] != COLOR_TO_IDX:
+            raise ValueError("The level bank {} was generated with a different encoding of the objects".format(path))
+
+        self.levels = np.load(os.path.join(path, 'levels.npy'), mmap_mode='r')
+        self.agents = np.load(os.path.join(path, 'agents.npy'), mmap_mode='r')
+        self.seeds = np.load(os.path.join(path, 'seeds.npy'), mmap_mode='r')
+        self.attrs = np.load(os.path.join(path, 'attrs.npy'), mmap_mode='r')
+        self.attrs_offsets = np.load(os.path.join(path, 'attrs_offsets.npy'), mmap_mode='r')
+
+    @property
+    def width(self):
+        return self.meta['width']
+
+    @property
+    def height(self):
+        return self.meta['height']
+
+    def __len__(self):
+        return len(self.levels)
+
+    def index_of_seed(self, seed):
+        """
+        Index of the level generated with seed, None if it isn't in the bank
+        """
+        idx = int(np.searchsorted(self.seeds, seed))
+        if idx < len(self.seeds) and self.seeds[idx] == seed:
+            return idx
+        return None
+
+    def __getitem__(self, idx):
+        x, y, dir = self.agents[idx].tolist()
+        start, end = self.attrs_offsets[idx], self.attrs_offsets[idx + 1]
+        attrs, refs = pickle.loads(self.attrs[start:end].tobytes())
+        return Level(
+            array=self.levels[idx],
+            agent_pos=(x, y),
+            agent_dir=dir,
+            seed=int(self.seeds[idx]),
+            attrs=attrs,
+            refs=refs,
+        )
+
+
+class LevelBankEnv(Wrapper):
+    """
+    Reset the env to the levels of a LevelBank instead of generating them: the level with the index
+    options['level_idx'] if given, the level generated with the seed passed to reset if it is in the bank (same level as
+    the env without the bank), otherwise a random level of the bank
+    """
+    def __init__(self, env, bank):
+        super().__init__(env)
+        self.bank = bank if isinstance(bank, LevelBank) else LevelBank(bank)
+        assert (self.bank.width, self.bank.height) == (env.unwrapped.width, env.unwrapped.height)
+
+    def reset(self, *, seed=None, return_info=False, options=None):
+        options = dict(options) if options is not None else {}
+        idx = options.pop('level_idx', None)
+        if idx is None and seed is not None:
+            idx = self.bank.index_of_seed(seed)
+        if idx is None:
+            # seed the random generator of the env before sampling the level (same generator as gym.Env.reset)
+            if seed is not None:
+                self.env.unwrapped.np_random = np.random.default_rng(seed)
+                seed = None
+            idx = int(self.env.unwrapped.np_random.integers(len(self.bank)))
+        options['level'] = self.bank[idx]
+        return self.env.reset(seed=seed, return_info=return_info, options=options)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--env-name",
+        dest="env_name",
+        help="gym environment to load",
+        default="BabaIsYou-FourRoomEnv-v0",
+    )
+    parser.add_argument("--out", help="directory of the level bank", required=True)
+    parser.add_argument("--num_levels", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max_stack", type=int, default=2)
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    bank = generate_level_bank(
+        args.env_name, args.out, args.num_levels, seed=args.seed, max_stack=args.max_stack,
+        num_workers=args.num_workers
+    )
+    print(f"saved {len(bank)} levels of {args.env_name} in {args.out}")
@@ -2,7 +2,7 @@ import hashlib
 import math
 from abc import abstractmethod
 from enum import IntEnum
-from typing import Any, Callable, Optional, Union
+from typing import Any, Callable, NamedTuple, Optional, Union
 
 import gym
 import numpy as np
@@ -272,17 +272,47 @@ class MissionSpace(spaces.Space):
         return False
 
 
+class ObjKind(NamedTuple):
+    """
+    Immutable data shared by all the objects with the same type and color (see WorldObj.get_kind)
+    """
+    type: str
+    color: str
+    type_idx: int
+    color_idx: int
+
+    # the copies of an object share its kind
+    def __reduce__(self):
+        return WorldObj.get_kind, (self.type, self.color)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
 class WorldObj:
     """
     Base class for grid world objects
+
+    The attributes of the objects are stored in slots instead of a __dict__ to reduce the memory of large grids and of
+    their copies. The subclasses declare their own attributes in __slots__ and the attributes that are the same for all
+    their instances as class attributes. The type and the color of an object, and their indices, are stored in an
+    ObjKind shared by all the objects with the same type and color (flyweight), the instances only store a reference to
+    it along with their position and direction.
     """
+    # dir is only set for the objects that have a direction (e.g. when they are moved)
+    __slots__ = ("kind", "init_pos", "cur_pos", "dir")
+
+    # only the boxes contain an object
+    contains = None
+
+    # {(type, color): ObjKind}
+    _kinds = {}
 
     def __init__(self, type, color):
-        assert type in OBJECT_TO_IDX, type
-        assert color in COLOR_TO_IDX, color
-        self.type = type
-        self.color = color
-        self.contains = None
+        self.kind = WorldObj.get_kind(type, color)
 
         # Initial position of the object
         self.init_pos = None
@@ -290,6 +320,42 @@ class WorldObj:
         # Current position of the object
         self.cur_pos = None
 
+    @staticmethod
+    def get_kind(type, color):
+        """
+        Shared ObjKind of the objects with the type and the color
+        """
+        kind = WorldObj._kinds.get((type, color))
+        if kind is None:
+            assert type in OBJECT_TO_IDX, type
+            assert color in COLOR_TO_IDX, color
+            kind = WorldObj._kinds[type, color] = ObjKind(type, color, OBJECT_TO_IDX[type], COLOR_TO_IDX[color])
+        return kind
+
+    @property
+    def type(self):
+        return self.kind.type
+
+    @type.setter
+    def type(self, type):
+        self.kind = WorldObj.get_kind(type, self.kind.color)
+
+    @property
+    def color(self):
+        return self.kind.color
+
+    @color.setter
+    def color(self, color):
+        self.kind = WorldObj.get_kind(self.kind.type, color)
+
+    @property
+    def type_idx(self):
+        return self.kind.type_idx
+
+    @property
+    def color_idx(self):
+        return self.kind.color_idx
+
     def is_agent(self):
         return False
 
@@ -331,7 +397,8 @@ class WorldObj:
 
     def encode(self):
         """Encode the a description of this object as a 3-tuple of integers"""
-        return (OBJECT_TO_IDX[self.type], COLOR_TO_IDX[self.color], 0)
+        kind = self.kind
+        return (kind.type_idx, kind.color_idx, 0)
 
     @staticmethod
     def decode(type_idx, color_idx, state):
@@ -374,6 +441,8 @@ class WorldObj:
 
 
 class Goal(WorldObj):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("goal", "green")
 
@@ -392,6 +461,8 @@ class Floor(WorldObj):
     Colored floor tile the agent can walk over
     """
 
+    __slots__ = ()
+
     def __init__(self, color="blue"):
         super().__init__("floor", color)
 
@@ -405,6 +476,8 @@ class Floor(WorldObj):
 
 
 class Lava(WorldObj):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("lava", "red")
 
@@ -431,6 +504,8 @@ class Lava(WorldObj):
 
 
 class Wall(WorldObj):
+    __slots__ = ()
+
     def __init__(self, color="grey"):
         super().__init__("wall", color)
 
@@ -442,6 +517,8 @@ class Wall(WorldObj):
 
 
 class Door(WorldObj):
+    __slots__ = ("is_open", "is_locked")
+
     def __init__(self, color, is_open=False, is_locked=False):
         super().__init__("door", color)
         self.is_open = is_open
@@ -510,6 +587,8 @@ class Door(WorldObj):
 
 
 class Key(WorldObj):
+    __slots__ = ()
+
     def __init__(self, color="blue"):
         super().__init__("key", color)
 
@@ -532,6 +611,8 @@ class Key(WorldObj):
 
 
 class Ball(WorldObj):
+    __slots__ = ()
+
     def __init__(self, color="blue"):
         super().__init__("ball", color)
 
@@ -543,6 +624,8 @@ class Ball(WorldObj):
 
 
 class Box(WorldObj):
+    __slots__ = ("contains",)
+
     def __init__(self, color, contains=None):
         super().__init__("box", color)
         self.contains = contains
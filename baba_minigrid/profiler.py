@@ -0,0 +1,77 @@
+"""
+Wall-time of the phases of BabaIsYouEnv.step and reset.
+
+Pass a profiler to the env (or set env.profiler) to record the time spent in each phase:
+    profiler = StepProfiler()
+    env = FourRoomEnv(profiler=profiler)
+    ...
+    print(profiler.report())
+
+Several envs can share the same profiler, and the profilers of different processes can be summed with merge. Without
+profiler (the default), the env only checks that env.profiler is None between the phases.
+"""
+import time
+from collections import defaultdict
+
+# Phases of step
+STEP_PHASES = ('agent', 'is_move', 'reward', 'extract_ruleset', 'replace', 'gen_obs')
+# Phases of reset
+RESET_PHASES = ('gen_grid', 'extract_ruleset', 'set_agent', 'gen_obs')
+
+
+class StepProfiler:
+    """
+    Total time (s) and number of calls of each phase of step and reset, stored in dicts keyed by (method, phase), the
+    method being 'step' or 'reset'. The phase 'total' is the time of the whole method.
+    """
+    def __init__(self):
+        self.times = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def lap(self, method, phase, t0):
+        """
+        Add the time since t0 to the phase and return the current time (the start of the next phase)
+        """
+        t = time.perf_counter()
+        key = (method, phase)
+        self.times[key] += t - t0
+        self.counts[key] += 1
+        return t
+
+    def clear(self):
+        self.times.clear()
+        self.counts.clear()
+
+    def merge(self, *profilers):
+        """
+        Add the times and counts of other profilers (e.g. the profilers of the envs of different workers)
+        """
+        for profiler in profilers:
+            for key, t in profiler.times.items():
+                self.times[key] += t
+            for key, n in profiler.counts.items():
+                self.counts[key] += n
+        return self
+
+    def mean_times(self):
+        """
+        Average time (s) of each phase per call of the method
+        """
+        return {
+            (method, phase): t / max(self.counts[(method, 'total')], 1) for (method, phase), t in self.times.items()
+        }
+
+    def report(self):
+        """
+        Table of the average time (us) of the phases and of their fraction of the time of the method
+        """
+        lines = ["{:<6} {:<16} {:>10} {:>7}".format("method", "phase", "mean (us)", "%")]
+        mean_times = self.mean_times()
+        for method, phases in [('step', STEP_PHASES), ('reset', RESET_PHASES)]:
+            total = mean_times.get((method, 'total'), 0)
+            if total == 0:
+                continue
+            for phase in phases + ('total',):
+                t = mean_times.get((method, phase), 0)
+                lines.append("{:<6} {:<16} {:>10.1f} {:>7.1f}".format(method, phase, 1e6 * t, 100 * t / total))
+        return "\n".join(lines)
@@ -1,4 +1,5 @@
 import math
+from collections import OrderedDict
 
 import numpy as np
 
@@ -22,15 +23,15 @@ def downsample(img, factor):
 
 def fill_coords(img, fn, color):
     """
-    Fill pixels of an image with coordinates matching a filter function
+    Fill pixels of an image with coordinates matching a filter function. The filter function is called once with the
+    arrays of x and y coordinates of all the pixels.
     """
 
-    for y in range(img.shape[0]):
-        for x in range(img.shape[1]):
-            yf = (y + 0.5) / img.shape[0]
-            xf = (x + 0.5) / img.shape[1]
-            if fn(xf, yf):
-                img[y, x] = color
+    yf = (np.arange(img.shape[0]) + 0.5) / img.shape[0]
+    xf = (np.arange(img.shape[1]) + 0.5) / img.shape[1]
+    xf, yf = np.meshgrid(xf, yf)
+
+    img[fn(xf, yf)] = color
 
     return img
 
@@ -61,20 +62,16 @@ def point_in_line(x0, y0, x1, y1, r):
     ymax = max(y0, y1) + r
 
     def fn(x, y):
-        # Fast, early escape test
-        if x < xmin or x > xmax or y < ymin or y > ymax:
-            return False
-
-        q = np.array([x, y])
-        pq = q - p0
+        in_bbox = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
 
         # Closest point on line
-        a = np.dot(pq, dir)
+        a = (x - p0[0]) * dir[0] + (y - p0[1]) * dir[1]
         a = np.clip(a, 0, dist)
-        p = p0 + a * dir
+        px = p0[0] + a * dir[0]
+        py = p0[1] + a * dir[1]
 
-        dist_to_line = np.linalg.norm(q - p)
-        return dist_to_line <= r
+        dist_to_line = np.sqrt((x - px) ** 2 + (y - py) ** 2)
+        return in_bbox & (dist_to_line <= r)
 
     return fn
 
@@ -88,7 +85,7 @@ def point_in_circle(cx, cy, r):
 
 def point_in_rect(xmin, xmax, ymin, ymax):
     def fn(x, y):
-        return x >= xmin and x <= xmax and y >= ymin and y <= ymax
+        return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
 
     return fn
 
@@ -101,14 +98,15 @@ def point_in_triangle(a, b, c):
     def fn(x, y):
         v0 = c - a
         v1 = b - a
-        v2 = np.array((x, y)) - a
+        v2x = x - a[0]
+        v2y = y - a[1]
 
         # Compute dot products
         dot00 = np.dot(v0, v0)
         dot01 = np.dot(v0, v1)
-        dot02 = np.dot(v0, v2)
+        dot02 = v0[0] * v2x + v0[1] * v2y
         dot11 = np.dot(v1, v1)
-        dot12 = np.dot(v1, v2)
+        dot12 = v1[0] * v2x + v1[1] * v2y
 
         # Compute barycentric coordinates
         inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
@@ -116,7 +114,7 @@ def point_in_triangle(a, b, c):
         v = (dot00 * dot12 - dot01 * dot02) * inv_denom
 
         # Check if point is in triangle
-        return (u >= 0) and (v >= 0) and (u + v) < 1
+        return (u >= 0) & (v >= 0) & ((u + v) < 1)
 
     return fn
 
@@ -129,3 +127,124 @@ def highlight_img(img, color=(255, 255, 255), alpha=0.30):
     blend_img = img + alpha * (np.array(color, dtype=np.uint8) - img)
     blend_img = blend_img.clip(0, 255).astype(np.uint8)
     img[:, :, :] = blend_img
+
+
+class TileCache:
+    """
+    Least recently used cache of rendered tiles, with at most capacity tiles (unbounded if capacity is None)
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return the tile for key and mark it as recently used, or None if it is not in the cache
+        """
+        img = self.tiles.get(key)
+        if img is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+        return img
+
+    def put(self, key, img):
+        self.tiles[key] = img
+        self.tiles.move_to_end(key)
+        self._evict()
+
+    def set_capacity(self, capacity):
+        self.capacity = capacity
+        self._evict()
+
+    def _evict(self):
+        if self.capacity is None:
+            return
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.tiles.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.tiles),
+            "capacity": self.capacity,
+        }
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def __getitem__(self, key):
+        return self.tiles[key]
+
+    def __setitem__(self, key, img):
+        self.put(key, img)
+
+    def __len__(self):
+        return len(self.tiles)
+
+
+class TileAtlas:
+    """
+    Tiles of a given size stored in a single array, so that a frame can be assembled with one gather. The atlas is
+    cleared when it would contain more than max_tiles tiles.
+    """
+
+    def __init__(self, tile_size, max_tiles=4096):
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = np.zeros((64, tile_size, tile_size, 3), dtype=np.uint8)
+        self.index = {}
+
+    def add(self, key, img):
+        idx = len(self.index)
+        if idx == len(self.tiles):
+            self.tiles = np.concatenate([self.tiles, np.zeros_like(self.tiles)])
+        self.tiles[idx] = img
+        self.index[key] = idx
+        return idx
+
+    def indices(self, keys, make_tile):
+        """
+        Return the index in the atlas of each key, calling make_tile(k) to render the tile of keys[k] if it is not in
+        the atlas yet
+        """
+        n_missing = sum(key not in self.index for key in keys)
+        if len(self.index) + n_missing > self.max_tiles:
+            self.clear()
+
+        return np.array([
+            self.index[key] if key in self.index else self.add(key, make_tile(k))
+            for k, key in enumerate(keys)
+        ], dtype=np.int64)
+
+    def gather(self, tile_idx):
+        """
+        Assemble the image of a grid from an array of shape (width, height) with the index of the tile of each cell
+        """
+        width, height = tile_idx.shape
+        img = self.tiles[tile_idx.T]
+        # (height, width, tile_size, tile_size, 3) -> (height * tile_size, width * tile_size, 3)
+        img = img.transpose(0, 2, 1, 3, 4)
+        return img.reshape(height * self.tile_size, width * self.tile_size, 3)
+
+    def clear(self):
+        self.index.clear()
+
+    def __len__(self):
+        return len(self.index)
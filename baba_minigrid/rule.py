@@ -63,6 +63,14 @@ def maybe_add_rule(block_list, ruleset):
     if rule is None:
         return False
 
+    add_rule(rule, ruleset)
+    return True
+
+
+def add_rule(rule, ruleset):
+    """
+    Add a rule returned by extract_rule to the ruleset
+    """
     # make it easier to get active rules
     if '_rule_' not in ruleset:
         ruleset['_rule_'] = []
@@ -86,8 +94,6 @@ def maybe_add_rule(block_list, ruleset):
         replace_list.append((rule['object1'], rule['object2']))
         ruleset['replace'] = replace_list
 
-    return True
-
 
 def inside_grid(grid, pos):
     """
@@ -98,6 +104,42 @@ def inside_grid(grid, pos):
     return inside_grid
 
 
+def extract_rules_at(grid, i, j):
+    """
+    Return the list of rules formed with the 'is' block at position i, j (horizontal rule first)
+    """
+    e = grid.get(i, j)
+    rules = []
+
+    # check for horizontal rules
+    if inside_grid(grid, (i-1, j)) and inside_grid(grid, (i+1, j)):
+        left_cell = grid.get(i-1, j)
+        right_cell = grid.get(i+1, j)
+        # check for color rule  # TODO: make it more general
+        rule = None
+        if inside_grid(grid, (i-2, j)):
+            rule = extract_rule([grid.get(i-2, j), left_cell, e, right_cell])
+        if rule is None:
+            rule = extract_rule([left_cell, e, right_cell])
+        if rule is not None:
+            rules.append(rule)
+
+    # check for vertical rules
+    if inside_grid(grid, (i, j-1)) and inside_grid(grid, (i, j+1)):
+        up_cell = grid.get(i, j-1)
+        down_cell = grid.get(i, j+1)
+        # check for color rule  # TODO: make it more general
+        rule = None
+        if inside_grid(grid, (i, j-2)):
+            rule = extract_rule([grid.get(i, j-2), up_cell, e, down_cell])
+        if rule is None:
+            rule = extract_rule([up_cell, e, down_cell])
+        if rule is not None:
+            rules.append(rule)
+
+    return rules
+
+
 def extract_ruleset(grid, default_ruleset=None):
     """
     Construct the ruleset from the grid. Called every time a RuleBlock is pushed.
@@ -114,30 +156,68 @@ def extract_ruleset(grid, default_ruleset=None):
             i, j = k % grid.width, k // grid.width
             assert k == j * grid.width + i
 
-            # check for horizontal rules
-            if inside_grid(grid, (i-1, j)) and inside_grid(grid, (i+1, j)):
-                left_cell = grid.get(i-1, j)
-                right_cell = grid.get(i+1, j)
-                # check for color rule  # TODO: make it more general
-                if inside_grid(grid, (i-2, j)):
-                    is_color_rule = maybe_add_rule([grid.get(i-2, j), left_cell, e, right_cell], ruleset)
-                else:
-                    is_color_rule = False
-
-                if not is_color_rule:
-                    maybe_add_rule([left_cell, e, right_cell], ruleset)
-
-            # check for vertical rules
-            if inside_grid(grid, (i, j-1)) and inside_grid(grid, (i, j+1)):
-                up_cell = grid.get(i, j-1)
-                down_cell = grid.get(i, j+1)
-                # check for color rule  # TODO: make it more general
-                if inside_grid(grid, (i, j-2)):
-                    is_color_rule = maybe_add_rule([grid.get(i, j-2), up_cell, e, down_cell], ruleset)
-                else:
-                    is_color_rule = False
-
-                if not is_color_rule:
-                        maybe_add_rule([up_cell, e, down_cell], ruleset)
+            for rule in extract_rules_at(grid, i, j):
+                add_rule(rule, ruleset)
 
     return ruleset
+
+
+class RuleIndex:
+    """
+    Index of the rules formed by each 'is' block of a grid. The rules are re-extracted only around the cells in
+    grid.rule_dirty (cells where a RuleBlock was added, removed or uncovered), instead of scanning the whole grid.
+    """
+    def __init__(self, grid, default_ruleset=None):
+        self.default_ruleset = default_ruleset
+        # position of the 'is' blocks -> rules formed with that block
+        self.rules = {}
+
+        for k, e in enumerate(grid):
+            if e is not None and e.type == 'rule_is':
+                i, j = k % grid.width, k // grid.width
+                self.rules[(i, j)] = extract_rules_at(grid, i, j)
+        grid.rule_dirty.clear()
+
+    def update(self, grid):
+        """
+        Re-extract the rules around the modified cells of the grid, return True if the rules have changed
+        """
+        if len(grid.rule_dirty) == 0:
+            return False
+
+        # 'is' blocks whose rules can contain one of the modified cells
+        positions = set()
+        for (x, y) in grid.rule_dirty:
+            for d in (-1, 0, 1, 2):
+                positions.add((x + d, y))
+                positions.add((x, y + d))
+        grid.rule_dirty.clear()
+
+        has_changed = False
+        for pos in positions:
+            if not inside_grid(grid, pos):
+                continue
+
+            e = grid.get(*pos)
+            if e is not None and e.type == 'rule_is':
+                rules = extract_rules_at(grid, *pos)
+                has_changed = has_changed or rules != self.rules.get(pos, [])
+                self.rules[pos] = rules
+            elif pos in self.rules:
+                has_changed = has_changed or len(self.rules[pos]) > 0
+                del self.rules[pos]
+
+        return has_changed
+
+    def get_ruleset(self):
+        """
+        Construct the ruleset from the indexed rules, same as extract_ruleset
+        """
+        ruleset = defaultdict(dict)
+        ruleset.update(self.default_ruleset) if self.default_ruleset is not None else None
+
+        # same order as extract_ruleset (row-major order of the 'is' blocks)
+        for pos in sorted(self.rules, key=lambda p: (p[1], p[0])):
+            for rule in self.rules[pos]:
+                add_rule(rule, ruleset)
+        return ruleset
@@ -0,0 +1,284 @@
+"""
+Record the episodes of an env in a compact binary file, and read them back or replay them.
+
+The file is append-only: a header followed by chunks of episodes, each chunk storing the columns of its episodes as
+contiguous arrays (optionally compressed):
+    seeds: int64 (num_episodes,) seeds passed to reset
+    lengths: int32 (num_episodes,) number of steps
+    terminated: bool (num_episodes,) if the last step of the episode returned done
+    agents: int16 (num_episodes, 3) initial position and direction of the agent
+    levels: uint8 (num_episodes, width, height, max_stack, 4) initial grid encoded like BabaIsYouArrayGrid
+    actions: uint8 (num_steps,) actions of all the steps of the episodes
+    rewards: float32 (num_steps,)
+    obs: optional (num_steps + num_episodes, *obs_shape) observations of reset and of each step
+
+A chunk is written when chunk_size episodes are recorded, so many workers can each write their own file with little
+overhead, and a file whose last chunk is incomplete (e.g. a killed worker) can still be read.
+
+Example:
+    env = TrajectoryRecorder(FourRoomEnv(), "fourroom.traj", compression="zlib")
+    ...
+    env.close()
+    for episode in TrajectoryReader("fourroom.traj"):
+        for obs, reward, done, info in replay_episode(FourRoomEnv(), episode):
+            ...
+"""
+import bz2
+import json
+import lzma
+import os
+import struct
+import zlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+from gym import Wrapper
+
+from baba_minigrid.babaisyou import OBJ_TYPE
+from baba_minigrid.level_bank import encode_level
+from baba_minigrid.minigrid import OBJECT_TO_IDX
+
+FILE_MAGIC = b"BABATRJ1"
+CHUNK_MAGIC = b"CHNK"
+# length of the json header of the file or of a chunk, and length of the payload of the chunk
+_header_struct = struct.Struct("<I")
+_chunk_struct = struct.Struct("<IQ")
+
+compressors = {
+    None: (lambda data: data, lambda data: data),
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+    "bz2": (bz2.compress, bz2.decompress),
+}
+
+
+class Episode(NamedTuple):
+    seed: int
+    agent_pos: tuple
+    agent_dir: int
+    # initial grid encoded like BabaIsYouArrayGrid.array
+    level: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    terminated: bool
+    # observations returned by reset and by each step, None if not recorded
+    obs: Optional[np.ndarray]
+
+
+class TrajectoryWriter:
+    """
+    Append episodes to a trajectory file, in chunks of chunk_size episodes
+    """
+    def __init__(self, path, compression=None, chunk_size=100, meta=None):
+        assert compression in compressors, "{} not in {}".format(compression, list(compressors))
+        self.path = path
+        self.compression = compression
+        self.chunk_size = chunk_size
+        self._episodes = []
+
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            header = json.dumps(meta or {}).encode("utf8")
+            self._file.write(FILE_MAGIC + _header_struct.pack(len(header)) + header)
+            self._file.flush()
+
+    def add_episode(self, episode: Episode):
+        self._episodes.append(episode)
+        if len(self._episodes) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the episodes added since the last chunk
+        """
+        if len(self._episodes) == 0:
+            return
+        episodes, self._episodes = self._episodes, []
+
+        # pad the stacks of the levels to the highest one of the chunk
+        max_stack = max(e.level.shape[2] for e in episodes)
+        levels = np.stack([_pad_stack(e.level, max_stack) for e in episodes])
+
+        columns = {
+            "seeds": np.array([e.seed for e in episodes], dtype=np.int64),
+            "lengths": np.array([len(e.actions) for e in episodes], dtype=np.int32),
+            "terminated": np.array([e.terminated for e in episodes], dtype=bool),
+            "agents": np.array([(*e.agent_pos, e.agent_dir) for e in episodes], dtype=np.int16),
+            "levels": levels,
+            "actions": np.concatenate([e.actions for e in episodes]).astype(np.uint8),
+            "rewards": np.concatenate([e.rewards for e in episodes]).astype(np.float32),
+        }
+        if episodes[0].obs is not None:
+            columns["obs"] = np.concatenate([e.obs for e in episodes])
+
+        compress = compressors[self.compression][0]
+        header, payload = [], []
+        for name, array in columns.items():
+            data = compress(np.ascontiguousarray(array).tobytes())
+            header.append([name, array.dtype.str, list(array.shape), len(data)])
+            payload.append(data)
+        header = json.dumps({"compression": self.compression, "columns": header}).encode("utf8")
+        payload = b"".join(payload)
+
+        # a single write so that the chunks are never interleaved and a partial chunk is only at the end of the file
+        self._file.write(CHUNK_MAGIC + _chunk_struct.pack(len(header), len(payload)) + header + payload)
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+def _pad_stack(level, max_stack):
+    if level.shape[2] == max_stack:
+        return level
+    pad = np.zeros((*level.shape[:2], max_stack - level.shape[2], 4), dtype=np.uint8)
+    pad[..., OBJ_TYPE] = OBJECT_TO_IDX["empty"]
+    return np.concatenate([level, pad], axis=2)
+
+
+class TrajectoryReader:
+    """
+    Stream the episodes of a trajectory file
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError("{} is not a trajectory file".format(path))
+            header_len, = _header_struct.unpack(f.read(_header_struct.size))
+            self.meta = json.loads(f.read(header_len))
+            self._data_offset = f.tell()
+
+    def iter_chunks(self):
+        """
+        Iterate over the chunks of the file as dicts of arrays, ignoring an incomplete chunk at the end of the file
+        """
+        file_size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            f.seek(self._data_offset)
+            while True:
+                start = f.tell()
+                prefix = f.read(len(CHUNK_MAGIC) + _chunk_struct.size)
+                if len(prefix) < len(CHUNK_MAGIC) + _chunk_struct.size:
+                    return
+                assert prefix[:len(CHUNK_MAGIC)] == CHUNK_MAGIC, "corrupted chunk at offset {}".format(start)
+                header_len, payload_len = _chunk_struct.unpack(prefix[len(CHUNK_MAGIC):])
+                if f.tell() + header_len + payload_len > file_size:
+                    return
+                header = json.loads(f.read(header_len))
+                decompress = compressors[header["compression"]][1]
+
+                chunk = {}
+                for name, dtype, shape, nbytes in header["columns"]:
+                    data = decompress(f.read(nbytes))
+                    chunk[name] = np.frombuffer(data, dtype=dtype).reshape(shape)
+                yield chunk
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            steps = np.concatenate([[0], np.cumsum(chunk["lengths"])])
+            obs = chunk.get("obs")
+            for n, (start, end) in enumerate(zip(steps[:-1], steps[1:])):
+                x, y, dir = chunk["agents"][n].tolist()
+                yield Episode(
+                    seed=int(chunk["seeds"][n]),
+                    agent_pos=(x, y),
+                    agent_dir=dir,
+                    level=chunk["levels"][n],
+                    actions=chunk["actions"][start:end],
+                    rewards=chunk["rewards"][start:end],
+                    terminated=bool(chunk["terminated"][n]),
+                    # one more observation per episode (the one returned by reset)
+                    obs=obs[start + n:end + n + 1] if obs is not None else None,
+                )
+
+
+def replay_episode(env, episode: Episode, check=True):
+    """
+    Re-simulate an episode by resetting env with the seed of the episode and taking its actions, yield the results of
+    env.step. If check, raise a ValueError if the initial level or the rewards differ from the recorded ones.
+    """
+    env.reset(seed=episode.seed)
+    if check:
+        level = _pad_stack(_encode_initial_level(env.unwrapped.grid), episode.level.shape[2])
+        if not np.array_equal(level, episode.level):
+            raise ValueError("The level generated with the seed {} differs from the recorded one".format(episode.seed))
+
+    for action, recorded_reward in zip(episode.actions.tolist(), episode.rewards.tolist()):
+        obs, reward, done, info = env.step(action)
+        if check and np.float32(reward) != recorded_reward:
+            raise ValueError("Replay of the episode with seed {} diverged".format(episode.seed))
+        yield obs, reward, done, info
+
+
+def _encode_initial_level(grid):
+    max_stack = max(len(cell) for cell in grid.grid) - 1
+    return encode_level(grid, max_stack)
+
+
+class TrajectoryRecorder(Wrapper):
+    """
+    Record the seed, the initial level, the actions, the rewards and optionally the observations of every episode in a
+    trajectory file. When reset is called without a seed, a seed is drawn from the random generator of the env so that
+    every episode can be replayed.
+    """
+    def __init__(self, env, path, compression=None, chunk_size=100, record_obs=False):
+        super().__init__(env)
+        spec = getattr(env, "spec", None)
+        meta = {"env_id": spec.id if spec is not None else None, "record_obs": record_obs}
+        self.writer = TrajectoryWriter(path, compression=compression, chunk_size=chunk_size, meta=meta)
+        self.record_obs = record_obs
+        self._episode = None
+
+    def reset(self, *, seed=None, **kwargs):
+        self._end_episode(terminated=False)
+        if seed is None:
+            seed = int(self.env.unwrapped.np_random.integers(2**31 - 1))
+        result = self.env.reset(seed=seed, **kwargs)
+        obs = result[0] if kwargs.get("return_info", False) else result
+
+        env = self.env.unwrapped
+        self._episode = {
+            "seed": seed,
+            "agent_pos": tuple(int(c) for c in env.agent_pos),
+            "agent_dir": int(env.agent_dir),
+            "level": _encode_initial_level(env.grid),
+            "actions": [],
+            "rewards": [],
+            "obs": [np.array(obs)] if self.record_obs else None,
+        }
+        return result
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        if self._episode is not None:
+            self._episode["actions"].append(action)
+            self._episode["rewards"].append(reward)
+            if self.record_obs:
+                self._episode["obs"].append(np.array(obs))
+            if done:
+                self._end_episode(terminated=True)
+        return obs, reward, done, info
+
+    def _end_episode(self, terminated):
+        if self._episode is None:
+            return
+        episode, self._episode = self._episode, None
+        self.writer.add_episode(Episode(
+            seed=episode["seed"],
+            agent_pos=episode["agent_pos"],
+            agent_dir=episode["agent_dir"],
+            level=episode["level"],
+            actions=np.array(episode["actions"], dtype=np.uint8),
+            rewards=np.array(episode["rewards"], dtype=np.float32),
+            terminated=terminated,
+            obs=np.stack(episode["obs"]) if self.record_obs else None,
+        ))
+
+    def close(self):
+        self._end_episode(terminated=False)
+        self.writer.close()
+        super().close()
@@ -1,6 +1,6 @@
+from copy import copy
 from itertools import product
 
-import cv2
 import numpy as np
 
 
@@ -12,6 +12,9 @@ def _get_font_scale(text):
     #     return 0.9
 
 def add_img_text(img, text):
+    # cv2 is only needed to render the rule blocks
+    import cv2
+
     font = cv2.FONT_HERSHEY_SIMPLEX
     fontscale = _get_font_scale(text)
     thickness = 3
@@ -24,10 +27,16 @@ def add_img_text(img, text):
                 thickness=thickness)
 
 
-def grid_random_position(size, n_samples=1, margin=0, exclude_pos: list = None):
+def grid_random_position(size, n_samples=1, margin=0, exclude_pos: list = None, np_random=None):
+    """
+    Sample n_samples distinct positions in the grid with the random generator np_random (the global numpy random state
+    if None)
+    """
+    if np_random is None:
+        np_random = np.random
     positions = list(product(range(margin, size-margin), range(margin, size-margin)))
     indices = np.arange(len(positions))
-    pos_idx = np.random.choice(indices, n_samples, replace=False)
+    pos_idx = np_random.choice(indices, n_samples, replace=False)
     sampled_pos = [positions[idx] for idx in pos_idx]
 
     if exclude_pos is not None:
@@ -38,7 +47,37 @@ def grid_random_position(size, n_samples=1, margin=0, exclude_pos: list = None):
                 is_valid = False
                 break
         if not is_valid:
-            sampled_pos = grid_random_position(size, n_samples, margin, exclude_pos)
+            sampled_pos = grid_random_position(size, n_samples, margin, exclude_pos, np_random)
 
     return sampled_pos
 
+
+_IMMUTABLE_TYPES = {type(None), bool, int, float, str, np.int64, np.float64, frozenset, type}
+
+
+def copy_state(value):
+    """
+    Copy the numpy arrays and the containers (dicts, lists, sets, tuples) of value recursively, sharing the other
+    objects (e.g. the objects of the grid), so that the copy isn't modified with value
+    """
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, dict):
+        # same type of dict (e.g. defaultdict)
+        value_copy = copy(value)
+        for k, v in value.items():
+            value_copy[k] = copy_state(v)
+        return value_copy
+    if isinstance(value, list):
+        return [copy_state(v) for v in value]
+    if isinstance(value, set):
+        return set(value)
+    if isinstance(value, tuple):
+        items = [copy_state(v) for v in value]
+        if all(item is v for item, v in zip(items, value)):
+            return value
+        # namedtuple or tuple
+        return value._make(items) if hasattr(value, '_make') else tuple(items)
+    return value
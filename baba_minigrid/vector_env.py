@@ -0,0 +1,617 @@
+import multiprocessing as mp
+import os
+
+import gym
+import numpy as np
+from gym import spaces
+from gym.vector.utils import CloudpickleWrapper
+
+from baba_minigrid.babaisyou import BabaIsYouEnv, BabaIsYouArrayGrid, OBJ_TYPE, OBJ_COLOR, OBJ_DIR, OBJ_FLAGS, \
+    FLAG_PUSH, zobrist_keys
+from baba_minigrid.flexible_world_object import properties, objects
+from baba_minigrid.minigrid import DIR_TO_VEC, OBJECT_TO_IDX, COLOR_TO_IDX
+
+# Direction of the agent after each action of BabaIsYouEnv.Actions (-1 for idle)
+ACTION_TO_DIR = np.array([-1, 3, 0, 1, 2])
+DIR_VEC = np.array(DIR_TO_VEC)
+
+IS_STOP, IS_PUSH, IS_AGENT, IS_PULL, IS_MOVE, IS_OPEN, IS_SHUT = [
+    properties.index(prop) for prop in ['is_stop', 'is_push', 'is_agent', 'is_pull', 'is_move', 'is_open', 'is_shut']
+]
+
+
+class BabaIsYouVecEnv:
+    """
+    Vectorized BabaIsYouEnv storing the grids of all the envs in stacked arrays of shape (num_envs, width, height,
+    max_stack, 4) (the grid of each env is a view of its slice) and the observations in a single batch array.
+
+    The steps that only turn and move the agent to an empty cell, or turn the agent against an object that blocks it,
+    are computed for all the envs at once with array operations. The other steps (pushing or pulling objects, changing
+    the rules, moving objects, ...) are delegated to BabaIsYouEnv._step and the levels are generated by
+    BabaIsYouEnv._reset, env by env, which update the stacked arrays in place; the cells they modify are then encoded
+    in the observations for all the envs at once. All the envs must have the same size and encoding level.
+
+    It is faster than a loop over the envs when most of the steps only move or turn the agent (e.g. 64 MakeRuleEnv),
+    not when the steps push objects or the episodes are a few steps long (e.g. GoToWinObjEnv, whose cost is the
+    generation of the levels). See benchmark_vec_env in baba_minigrid.benchmark.
+
+    Like the vectorized envs of stable-baselines3, step returns the batched observations, rewards and dones, and a list
+    with the info dict of each env. Done envs are automatically reset, and the last observation of the episode is
+    stored in info["terminal_observation"].
+    """
+
+    def __init__(self, env_fns, copy=True):
+        self.envs = [env_fn() for env_fn in env_fns]
+        self.num_envs = len(self.envs)
+        # return a copy of the batched observations (otherwise the array is updated in place by the next step)
+        self.copy = copy
+
+        # spaces of a single env
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+        for env in self.envs:
+            assert env.observation_space == self.observation_space
+
+        # envs using BabaIsYouEnv.step, whose steps can be vectorized
+        self._native = np.array([
+            isinstance(env, BabaIsYouEnv) and all(
+                getattr(type(env), method) is getattr(BabaIsYouEnv, method) for method in ['step', '_step', 'move']
+            )
+            for env in self.envs
+        ])
+        for env in self.envs:
+            if isinstance(env, BabaIsYouEnv):
+                # the grids are converted to array grids at the next reset
+                env.grid_backend = 'array'
+                env.readonly_obs = True
+
+        width, height, channels = self.observation_space.shape
+        assert channels % 3 == 0
+        self.width, self.height = width, height
+
+        # used to encode the stacks of objects at the encoding level of the envs
+        self._encoder = BabaIsYouArrayGrid(width, height, max_stack=1)
+        self._encoder.encoding_level = channels // 3
+
+        n_types = len(OBJECT_TO_IDX)
+        self._flexible_types = np.isin(np.arange(n_types), [OBJECT_TO_IDX[o] for o in objects])
+        self._rule_types = np.isin(np.arange(n_types), [
+            OBJECT_TO_IDX[t] for t in ['rule', 'rule_object', 'rule_is', 'rule_property', 'rule_color']
+        ])
+        self._wall_type = OBJECT_TO_IDX['wall']
+
+        # stacked state of the grids, allocated at reset
+        self.max_stack = 0
+        self.array = None
+        self.objects = None
+        self.stack_height = None
+        # compiled ruleset table of each env
+        self.tables = None
+        self.has_replace = np.zeros(self.num_envs, dtype=bool)
+
+        self.observations = np.zeros((self.num_envs,) + self.observation_space.shape, dtype=np.uint8)
+        self.rewards = np.zeros(self.num_envs, dtype=np.float64)
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+
+    def _stack_grids(self, reset_ids=()):
+        """
+        Allocate the stacked state for the current grids of the envs and make the grids views of it, encoding the
+        grids of the envs reset_ids
+        """
+        self.max_stack = max(
+            [env.grid.max_stack for env, native in zip(self.envs, self._native) if native], default=1
+        )
+        shape = (self.num_envs, self.width, self.height, self.max_stack)
+        self.array = np.zeros(shape + (4,), dtype=np.uint8)
+        self.array[..., OBJ_TYPE] = OBJECT_TO_IDX["empty"]
+        self.objects = np.empty(shape, dtype=object)
+        self.stack_height = np.zeros(shape[:3], dtype=np.int32)
+        self.tables = np.zeros((self.num_envs, len(properties), len(OBJECT_TO_IDX), len(COLOR_TO_IDX)), dtype=bool)
+
+        for n in np.flatnonzero(self._native):
+            self._attach(n)
+        self._encode_grids(reset_ids)
+
+    def _encode_grids(self, env_ids):
+        """
+        Encode the whole grids of the envs env_ids in their observations, and their Zobrist hashes, for all the envs at
+        once
+        """
+        env_ids = np.asarray(env_ids, dtype=int)
+        if len(env_ids) == 0:
+            return
+        obs = self._encoder._encode_stacks(self.array[env_ids], self.stack_height[env_ids])
+        self.observations[env_ids] = obs
+        i, j = np.indices((self.width, self.height))
+        hashes = np.bitwise_xor.reduce(zobrist_keys(i, j, obs).reshape(len(env_ids), -1), axis=1)
+        for n, obs_hash in zip(env_ids.tolist(), hashes.tolist()):
+            env = self.envs[n]
+            env._obs = self.observations[n]
+            env._obs_grid = env.grid
+            env._obs_hash = obs_hash
+            env.grid.dirty.clear()
+
+    def _attach(self, n):
+        """
+        Copy the grid and the observation of the env n in the stacked arrays and replace them by views
+        """
+        env = self.envs[n]
+        grid = env.grid
+        assert isinstance(grid, BabaIsYouArrayGrid)
+        assert (grid.width, grid.height) == (self.width, self.height)
+        if grid.max_stack > self.max_stack:
+            self._stack_grids()
+            return
+
+        s = grid.max_stack
+        self.array[n, :, :, :s] = grid.array
+        self.array[n, :, :, s:] = (OBJECT_TO_IDX["empty"], 0, 0, 0)
+        self.objects[n, :, :, :s] = grid.objects
+        self.objects[n, :, :, s:] = None
+        self.stack_height[n] = grid.stack_height
+        grid.array, grid.objects, grid.stack_height = self.array[n], self.objects[n], self.stack_height[n]
+        grid.max_stack = self.max_stack
+
+        if env._obs is not None and env._obs_grid is grid:
+            self.observations[n] = env._obs
+            env._obs = self.observations[n]
+        self._update_ruleset(n)
+
+    def _update_ruleset(self, n):
+        ruleset = self.envs[n]._ruleset
+        self.tables[n] = ruleset.table
+        self.has_replace[n] = len(ruleset.get('replace', [])) > 0
+
+    def reset(self, seed=None):
+        """
+        Reset all the envs, seeding the env n with seed + n if seed is an int
+        """
+        if seed is None:
+            seed = [None] * self.num_envs
+        elif isinstance(seed, int):
+            seed = [seed + n for n in range(self.num_envs)]
+        assert len(seed) == self.num_envs
+
+        self._stack_grids(self._reset_envs(range(self.num_envs), seed))
+        return self.observations.copy() if self.copy else self.observations
+
+    def _reset_envs(self, env_ids, seeds):
+        """
+        Reset the envs env_ids, the native envs with BabaIsYouEnv._reset, whose grids are encoded by _encode_grids once
+        attached. Return the ids of the native envs
+        """
+        native_ids = []
+        for n, seed in zip(env_ids, seeds):
+            env = self.envs[n]
+            if self._native[n] and type(env).reset is BabaIsYouEnv.reset:
+                env._reset(seed=seed)
+                native_ids.append(n)
+            else:
+                self.observations[n] = env.reset(seed=seed)
+        return native_ids
+
+    def get_state(self, n):
+        return self.envs[n].get_state()
+
+    def set_state(self, n, state):
+        """
+        Restore a snapshot of the env n returned by get_state
+        """
+        env = self.envs[n]
+        env.set_state(state)
+        if self._native[n]:
+            if env.grid.max_stack != self.max_stack:
+                self._stack_grids()
+            self._update_ruleset(n)
+        self.observations[n] = env.gen_obs()
+
+    def _top_objects(self):
+        """
+        Array of shape (num_envs, width, height, 4) with the top object of each cell
+        """
+        z = np.maximum(self.stack_height - 1, 0)
+        return np.take_along_axis(self.array, z[..., None, None], axis=3)[..., 0, :]
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_envs,)
+        env_idx = np.arange(self.num_envs)
+
+        # type and color of the top object of each cell, shape (num_envs, width, height)
+        top = self._top_objects()
+        top_type, top_color = top[..., OBJ_TYPE], top[..., OBJ_COLOR]
+
+        # only look up the properties needed for all the cells, the others are looked up around the agent
+        is_agent = self.tables[:, IS_AGENT][env_idx[:, None, None], top_type, top_color]
+        has_move = self.tables[:, IS_MOVE][env_idx[:, None, None], top_type, top_color].any(axis=(1, 2))
+
+        def props(x, y):
+            return self.tables[env_idx, :, top_type[env_idx, x, y], top_color[env_idx, x, y]]
+
+        # position of the agent if there is a single agent in the env
+        single_agent = is_agent.sum(axis=(1, 2)) == 1
+        agent_cell = is_agent.reshape(self.num_envs, -1).argmax(axis=1)
+        ax, ay = agent_cell // self.height, agent_cell % self.height
+
+        dirs = ACTION_TO_DIR[actions]
+        dx, dy = DIR_VEC[dirs].T
+        fx, fy, bx, by = ax + dx, ay + dy, ax - dx, ay - dy
+        in_bounds = (0 <= fx) & (fx < self.width) & (0 <= fy) & (fy < self.height) & \
+                    (0 <= bx) & (bx < self.width) & (0 <= by) & (by < self.height)
+        fx, fy = np.clip(fx, 0, self.width - 1), np.clip(fy, 0, self.height - 1)
+        bx, by = np.clip(bx, 0, self.width - 1), np.clip(by, 0, self.height - 1)
+
+        agent_props = props(ax, ay)
+        fwd_props = props(fx, fy)
+        fwd_type = top_type[env_idx, fx, fy]
+        fwd_height = self.stack_height[env_idx, fx, fy]
+
+        # the agent moves alone and no object can be pulled
+        simple = self._native & (actions != 0) & single_agent & in_bounds & ~self.has_replace & ~has_move & \
+            ~props(bx, by)[:, IS_PULL]
+
+        # the object under the agent is uncovered when the agent moves and must not be moving, nor be a rule block
+        # (uncovering it can complete a rule)
+        agent_height = self.stack_height[env_idx, ax, ay]
+        under = self.array[env_idx, ax, ay, np.maximum(agent_height - 2, 0)]
+        under_move = (agent_height >= 2) & self.tables[env_idx, IS_MOVE, under[:, OBJ_TYPE], under[:, OBJ_COLOR]]
+        under_rule = (agent_height >= 2) & self._rule_types[under[:, OBJ_TYPE]]
+        walk = simple & (fwd_height == 0) & ~under_move & ~under_rule
+
+        # the object in front of the agent can't be pushed or overlapped, and is not destroyed with the agent
+        fwd_flags = self.array[env_idx, fx, fy, np.maximum(fwd_height - 1, 0), OBJ_FLAGS]
+        blocking = (self._flexible_types[fwd_type] & fwd_props[:, IS_STOP] & ~fwd_props[:, IS_PUSH]) | \
+            (self._rule_types[fwd_type] & (fwd_flags & FLAG_PUSH == 0)) | (fwd_type == self._wall_type)
+        open_shut = (agent_props[:, IS_OPEN] & fwd_props[:, IS_SHUT]) | (agent_props[:, IS_SHUT] & fwd_props[:, IS_OPEN])
+        blocked = simple & (fwd_height > 0) & blocking & ~open_shut
+
+        idle = self._native & (actions == 0)
+
+        # move the agents to the empty cells in front of them
+        w = np.flatnonzero(walk)
+        if len(w) > 0:
+            wx, wy, wfx, wfy, wz = ax[w], ay[w], fx[w], fy[w], agent_height[w] - 1
+            self.array[w, wfx, wfy, 0] = self.array[w, wx, wy, wz]
+            self.array[w, wfx, wfy, 0, OBJ_DIR] = dirs[w]
+            self.objects[w, wfx, wfy, 0] = self.objects[w, wx, wy, wz]
+            self.array[w, wx, wy, wz] = (OBJECT_TO_IDX["empty"], 0, 0, 0)
+            self.objects[w, wx, wy, wz] = None
+            self.stack_height[w, wx, wy] -= 1
+            self.stack_height[w, wfx, wfy] = 1
+
+        # turn the blocked agents
+        b = np.flatnonzero(blocked)
+        self.array[b, ax[b], ay[b], agent_height[b] - 1, OBJ_DIR] = dirs[b]
+
+        infos = [{} for _ in range(self.num_envs)]
+        # native envs stepped by BabaIsYouEnv._step, whose modified cells are encoded with the ones of the walks
+        stepped = []
+        for n in range(self.num_envs):
+            env = self.envs[n]
+            if idle[n]:
+                env.step_count += 1
+                self.rewards[n], done = 0, False
+            elif walk[n] or blocked[n]:
+                env.step_count += 1
+                if walk[n]:
+                    agent = self.objects[n, fx[n], fy[n], 0]
+                    if env.grid._index is not None:
+                        env.grid.update_index(ax[n], ay[n])
+                        env.grid.update_index(fx[n], fy[n])
+                    env.agent_pos = (int(fx[n]), int(fy[n]))
+                else:
+                    agent = self.objects[n, ax[n], ay[n], agent_height[n] - 1]
+                    env.agent_pos = (int(ax[n]), int(ay[n]))
+                env.agent_dir = agent.dir = int(dirs[n])
+                agent.has_moved = True
+                # win or lose if the agent stays on itself
+                env.is_win = bool(blocked[n]) and agent.is_goal()
+                env.is_lose = bool(blocked[n]) and agent.is_defeat()
+                self.rewards[n], done = env.reward()
+            elif self._native[n]:
+                self.rewards[n], done = env._step(actions[n])
+                stepped.append(n)
+            else:
+                observation, self.rewards[n], done, infos[n] = env.step(actions[n])
+                self.observations[n] = observation
+
+            if env.step_count >= env.max_steps:
+                done = True
+            self.dones[n] = done
+
+        if any(self.envs[n].grid.max_stack != self.max_stack for n in stepped):
+            # a grid has grown
+            self._stack_grids()
+        for n in stepped:
+            self._update_ruleset(n)
+        self._update_observations(w, np.stack([ax[w], ay[w], fx[w], fy[w]], axis=1).reshape(-1, 2), stepped)
+
+        done_ids = np.flatnonzero(self.dones)
+        for n in done_ids:
+            infos[n]["terminal_observation"] = self.observations[n].copy()
+        reset_ids = self._reset_envs(done_ids, [None] * len(done_ids))
+        for n in reset_ids:
+            self._attach(n)
+        self._encode_grids(reset_ids)
+
+        return (
+            self.observations.copy() if self.copy else self.observations,
+            self.rewards.copy(),
+            self.dones.copy(),
+            infos,
+        )
+
+    def _update_observations(self, walked, walk_cells, stepped):
+        """
+        Re-encode the cells modified by the step in the observations of the native envs and update the Zobrist hashes
+        of the observations, for all the envs at once: the cells walk_cells (two cells for each env of walked) and the
+        dirty cells of the grids of the envs stepped by BabaIsYouEnv._step
+        """
+        env_ids = [np.repeat(walked, 2)]
+        cells = [walk_cells]
+        for n in stepped:
+            env = self.envs[n]
+            if env._obs_grid is not env.grid or env._obs.shape[-1] != self.observations.shape[-1]:
+                # the env has a new grid, encoded by gen_obs
+                env.gen_obs()
+                self._attach(n)
+                continue
+            dirty = env.grid.dirty
+            if len(dirty) > 0:
+                env_ids.append(np.full(len(dirty), n))
+                cells.append(np.array(list(dirty)))
+                dirty.clear()
+
+        ns = np.concatenate(env_ids)
+        if len(ns) == 0:
+            return
+        xs, ys = np.concatenate(cells).T
+        # remove the keys of the previous encoding of the cells and add the keys of the new one
+        keys = zobrist_keys(xs, ys, self.observations[ns, xs, ys])
+        self.observations[ns, xs, ys] = self._encoder._encode_stacks(self.array[ns, xs, ys], self.stack_height[ns, xs, ys])
+        keys ^= zobrist_keys(xs, ys, self.observations[ns, xs, ys])
+        hash_keys = np.zeros(self.num_envs, dtype=np.uint64)
+        np.bitwise_xor.at(hash_keys, ns, keys)
+        for n in np.unique(ns).tolist():
+            self.envs[n]._obs_hash ^= int(hash_keys[n])
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+class _EnvLoop:
+    """
+    Step the envs one by one, with the same interface as BabaIsYouVecEnv (used by the workers of
+    BabaIsYouSubprocVecEnv)
+    """
+
+    def __init__(self, env_fns, copy=True):
+        self.envs = [env_fn() for env_fn in env_fns]
+        self.num_envs = len(self.envs)
+        self.copy = copy
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+
+        self.observations = np.zeros((self.num_envs,) + self.observation_space.shape, dtype=np.uint8)
+        self.rewards = np.zeros(self.num_envs, dtype=np.float64)
+        self.dones = np.zeros(self.num_envs, dtype=bool)
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = [None] * self.num_envs
+        elif isinstance(seed, int):
+            seed = [seed + n for n in range(self.num_envs)]
+        for n, (env, env_seed) in enumerate(zip(self.envs, seed)):
+            self.observations[n] = env.reset(seed=env_seed)
+        return self.observations.copy() if self.copy else self.observations
+
+    def step(self, actions):
+        infos = []
+        for n, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, self.rewards[n], self.dones[n], info = env.step(action)
+            if self.dones[n]:
+                info["terminal_observation"] = observation
+                observation = env.reset()
+            self.observations[n] = observation
+            infos.append(info)
+        return (
+            self.observations.copy() if self.copy else self.observations,
+            self.rewards.copy(),
+            self.dones.copy(),
+            infos,
+        )
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+def _shared_arrays(shared, obs_shape):
+    """
+    Wrap the shared buffers in the arrays of observations, rewards, dones and actions
+    """
+    observations, rewards, dones, actions = shared
+    return [
+        np.frombuffer(observations, dtype=np.uint8).reshape((-1,) + obs_shape),
+        np.frombuffer(rewards, dtype=np.float64),
+        np.frombuffer(dones, dtype=bool),
+        np.frombuffer(actions, dtype=np.int64),
+    ]
+
+
+def _worker(remote, parent_remote, env_fns, shared, obs_shape, env_slice, cpus, vectorize):
+    """
+    Step the envs env_slice of the shared arrays, with a BabaIsYouVecEnv if vectorize, otherwise one by one
+    """
+    parent_remote.close()
+    if cpus is not None:
+        os.sched_setaffinity(0, cpus)
+
+    vec_env = (BabaIsYouVecEnv if vectorize else _EnvLoop)(env_fns.fn, copy=False)
+    observations, rewards, dones, actions = [array[env_slice] for array in _shared_arrays(shared, obs_shape)]
+    # the envs write their results directly in the shared buffers
+    vec_env.observations, vec_env.rewards, vec_env.dones = observations, rewards, dones
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                _, _, _, infos = vec_env.step(actions)
+                # only send the non-empty infos
+                remote.send([(n, info) for n, info in enumerate(infos) if info])
+            elif cmd == "reset":
+                vec_env.reset(seed=data)
+                remote.send(None)
+            elif cmd == "get_spaces":
+                remote.send((vec_env.observation_space.shape, vec_env.action_space.n))
+            elif cmd == "call":
+                name, args, kwargs = data
+                results = []
+                for env in vec_env.envs:
+                    attr = getattr(env, name)
+                    results.append(attr(*args, **kwargs) if callable(attr) else attr)
+                remote.send(results)
+            elif cmd == "close":
+                vec_env.close()
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(cmd)
+    except KeyboardInterrupt:
+        pass
+
+
+class BabaIsYouSubprocVecEnv:
+    """
+    Run batches of envs in worker processes, each worker stepping envs_per_worker envs one by one, or with a
+    BabaIsYouVecEnv if vectorize (faster only for the envs whose steps mostly move the agent, see BabaIsYouVecEnv).
+
+    The observations, rewards, dones and actions are stored in shared memory: the workers write the observations
+    directly in the batch array instead of sending them through the pipes, which only carry the commands and the
+    non-empty info dicts. If cpu_affinity is True, the worker k is pinned to the cpu k (modulo the number of cpus),
+    otherwise cpu_affinity can be a list with the set of cpus of each worker.
+    """
+
+    def __init__(self, env_fns, envs_per_worker=1, cpu_affinity=None, copy=True, start_method=None, vectorize=False):
+        self.num_envs = len(env_fns)
+        self.copy = copy
+        self.closed = False
+        self.waiting = False
+
+        env_slices = [
+            slice(start, min(start + envs_per_worker, self.num_envs))
+            for start in range(0, self.num_envs, envs_per_worker)
+        ]
+        num_workers = len(env_slices)
+
+        if cpu_affinity is True:
+            cpu_affinity = [{k % os.cpu_count()} for k in range(num_workers)]
+        elif cpu_affinity is None:
+            cpu_affinity = [None] * num_workers
+        assert len(cpu_affinity) == num_workers
+
+        if start_method is None:
+            # fork is faster but not available on every platform
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # the spaces are the same for all the envs, get them from the first one
+        env = env_fns[0]()
+        obs_shape, n_actions = env.observation_space.shape, env.action_space.n
+        env.close()
+        self.observation_space = spaces.Box(low=0, high=255, shape=obs_shape, dtype="uint8")
+        self.action_space = spaces.Discrete(n_actions)
+
+        # buffers shared with the workers
+        shared = [
+            ctx.RawArray("B", int(np.prod((self.num_envs,) + obs_shape))),
+            ctx.RawArray("d", self.num_envs),
+            ctx.RawArray("B", self.num_envs),
+            ctx.RawArray("q", self.num_envs),
+        ]
+        self.observations, self.rewards, self.dones, self.actions = _shared_arrays(shared, obs_shape)
+
+        self.env_slices = env_slices
+        self.remotes, self.processes = [], []
+        for env_slice, cpus in zip(env_slices, cpu_affinity):
+            remote, work_remote = ctx.Pipe()
+            args = (
+                work_remote, remote, CloudpickleWrapper(env_fns[env_slice]), shared, obs_shape, env_slice, cpus,
+                vectorize,
+            )
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+    @classmethod
+    def from_env_id(cls, env_id, num_envs, envs_per_worker=1, cpu_affinity=None, vectorize=False, **env_kwargs):
+        """
+        Make num_envs envs of a registered BabaIsYou env (e.g. "BabaIsYou-GoToWinObj-v0") without the gym wrappers
+        """
+        def _make_env():
+            return gym.make(env_id, **env_kwargs).unwrapped
+
+        return cls(
+            [_make_env] * num_envs, envs_per_worker=envs_per_worker, cpu_affinity=cpu_affinity, vectorize=vectorize
+        )
+
+    def reset(self, seed=None):
+        """
+        Reset all the envs, seeding the env n with seed + n if seed is an int
+        """
+        if isinstance(seed, int):
+            seed = [seed + n for n in range(self.num_envs)]
+        for remote, env_slice in zip(self.remotes, self.env_slices):
+            remote.send(("reset", None if seed is None else seed[env_slice]))
+        for remote in self.remotes:
+            remote.recv()
+        return self.observations.copy() if self.copy else self.observations
+
+    def step_async(self, actions):
+        self.actions[:] = actions
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self):
+        infos = [{} for _ in range(self.num_envs)]
+        for remote, env_slice in zip(self.remotes, self.env_slices):
+            for n, info in remote.recv():
+                infos[env_slice.start + n] = info
+        self.waiting = False
+        return (
+            self.observations.copy() if self.copy else self.observations,
+            self.rewards.copy(),
+            self.dones.copy(),
+            infos,
+        )
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def call(self, name, *args, **kwargs):
+        """
+        Call the method name of all the envs (or get the attribute if it is not callable)
+        """
+        for remote in self.remotes:
+            remote.send(("call", (name, args, kwargs)))
+        return [result for remote in self.remotes for result in remote.recv()]
+
+    def get_attr(self, name):
+        return self.call(name)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
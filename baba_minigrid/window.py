@@ -1,10 +1,19 @@
-# Only ask users to install matplotlib if they actually need it
-try:
-    import matplotlib.pyplot as plt
-except ImportError:
-    raise ImportError(
-        "To display the environment in a window, please install matplotlib, eg: `pip3 install --user matplotlib`"
-    )
+# matplotlib.pyplot, imported when the first window is created (importing it takes longer than the rest of the package)
+plt = None
+
+
+def _import_pyplot():
+    global plt
+    if plt is None:
+        # Only ask users to install matplotlib if they actually need it
+        try:
+            import matplotlib.pyplot
+        except ImportError:
+            raise ImportError(
+                "To display the environment in a window, please install matplotlib, eg: `pip3 install --user matplotlib`"
+            )
+        plt = matplotlib.pyplot
+    return plt
 
 
 class Window:
@@ -13,6 +22,7 @@ class Window:
     """
 
     def __init__(self, title):
+        _import_pyplot()
         self.no_image_shown = True
 
         # Create the figure and axes
@@ -116,6 +116,44 @@ class ImgObsWrapper(ObservationWrapper):
         return obs["image"]
 
 
+def one_hot_bits():
+    """
+    Number of bits of the one-hot encoding of an object (type, color and state)
+    """
+    return len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + len(STATE_TO_IDX)
+
+
+def one_hot_indices(obs):
+    """
+    Indices of the bits set in the one-hot encoding of an observation of shape (..., 3 * num_objects), i.e. the
+    (type, color, state) of each object offset by the position of its bits, to use with an embedding layer. The objects
+    of a cell (e.g. the encoding_level objects at the top of the cells of BabaIsYouEnv) are encoded one after the other.
+    """
+    num_objects = obs.shape[-1] // 3
+    offsets = np.array([0, len(OBJECT_TO_IDX), len(OBJECT_TO_IDX) + len(COLOR_TO_IDX)])
+    offsets = (np.arange(num_objects)[:, None] * one_hot_bits() + offsets).reshape(-1)
+    return obs.astype(np.int64) + offsets
+
+
+def one_hot(obs, out=None):
+    """
+    One-hot encoding of shape (..., num_objects * one_hot_bits()) of an observation of shape (..., 3 * num_objects),
+    written in out if given
+    """
+    shape = obs.shape[:-1] + (obs.shape[-1] // 3 * one_hot_bits(),)
+    if out is None:
+        out = np.zeros(shape, dtype=np.uint8)
+    else:
+        assert out.shape == shape and out.flags.c_contiguous
+        out.fill(0)
+
+    # scatter the ones in the flattened array: the bits of the cell k start at k * shape[-1]
+    indices = one_hot_indices(obs).reshape(-1, obs.shape[-1])
+    indices += np.arange(len(indices))[:, None] * shape[-1]
+    out.reshape(-1)[indices] = 1
+    return out
+
+
 class OneHotPartialObsWrapper(ObservationWrapper):
     """
     Wrapper to get a one-hot encoding of a partially observable
@@ -130,7 +168,7 @@ class OneHotPartialObsWrapper(ObservationWrapper):
         obs_shape = env.observation_space["image"].shape
 
         # Number of bits per cell
-        num_bits = len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + len(STATE_TO_IDX)
+        num_bits = one_hot_bits()
 
         new_image_space = spaces.Box(
             low=0, high=255, shape=(obs_shape[0], obs_shape[1], num_bits), dtype="uint8"
@@ -140,20 +178,47 @@ class OneHotPartialObsWrapper(ObservationWrapper):
         )
 
     def observation(self, obs):
-        img = obs["image"]
-        out = np.zeros(self.observation_space.spaces["image"].shape, dtype="uint8")
+        return {**obs, "image": one_hot(obs["image"])}
+
+
+class OneHotObsWrapper(ObservationWrapper):
+    """
+    One-hot encoding of the observations of BabaIsYouEnv, with the one-hot encodings of the encoding_level objects of
+    each cell concatenated along the last axis. With mode="index", the observations are the indices of the bits set
+    instead (see one_hot_indices).
 
-        for i in range(img.shape[0]):
-            for j in range(img.shape[1]):
-                type = img[i, j, 0]
-                color = img[i, j, 1]
-                state = img[i, j, 2]
+    If the env returns read-only observations (readonly_obs=True), the one-hot observations are written in the same
+    read-only buffer at each step.
+    """
 
-                out[i, j, type] = 1
-                out[i, j, len(OBJECT_TO_IDX) + color] = 1
-                out[i, j, len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + state] = 1
+    def __init__(self, env, mode="one_hot"):
+        super().__init__(env)
+        assert mode in ["one_hot", "index"], mode
+        self.mode = mode
+
+        width, height, channels = env.observation_space.shape
+        num_bits = channels // 3 * one_hot_bits()
+        if mode == "one_hot":
+            self.observation_space = spaces.Box(low=0, high=1, shape=(width, height, num_bits), dtype="uint8")
+        else:
+            self.observation_space = spaces.Box(
+                low=0, high=num_bits - 1, shape=(width, height, channels), dtype="int64"
+            )
+        self._out = None
 
-        return {**obs, "image": out}
+    def observation(self, obs):
+        if self.mode == "index":
+            return one_hot_indices(obs)
+
+        if not getattr(self.unwrapped, "readonly_obs", False):
+            return one_hot(obs)
+
+        if self._out is None or self._out.shape != self.observation_space.shape:
+            self._out = np.zeros(self.observation_space.shape, dtype=np.uint8)
+        one_hot(obs, self._out)
+        out = self._out.view()
+        out.flags.writeable = False
+        return out
 
 
 class RGBImgObsWrapper(ObservationWrapper):
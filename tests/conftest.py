@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(params=["list", "array"])
+def grid_backend(request):
+    """
+    Run the test with each grid backend of BabaIsYouEnv
+    """
+    return request.param
+
+
+def _random_rollout(env, num_steps, seed=0):
+    """
+    Step env with the random actions of RandomState(seed) and yield (action, obs, reward, done) after each step. The
+    env is reset after a done step, once the caller has checked it.
+    """
+    rng = np.random.RandomState(seed)
+    for _ in range(num_steps):
+        action = rng.randint(len(env.actions))
+        obs, reward, done, _ = env.step(action)
+        yield action, obs, reward, done
+        if done:
+            env.reset()
+
+
+@pytest.fixture
+def random_rollout():
+    return _random_rollout
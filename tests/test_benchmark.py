@@ -0,0 +1,50 @@
+from baba_minigrid.benchmark import METRICS, benchmark_level_construction, benchmark_subproc_vec_env, \
+    benchmark_vec_env, compare_to_baseline, run_benchmarks
+from baba_minigrid.flexible_world_object import FWall
+
+
+def test_benchmark():
+    results = run_benchmarks(
+        ["BabaIsYou-MoveObj-v0", "BabaIsYou-MakeRule-v0"], sizes=[None, 9], encoding_levels=[1, 2], num_steps=20,
+        num_calls=2, repeat=1
+    )
+    # MakeRuleEnv doesn't have a size argument
+    assert [(r["env"], r["size"], r["encoding_level"]) for r in results] == [
+        ("BabaIsYou-MoveObj-v0", None, 1), ("BabaIsYou-MoveObj-v0", None, 2),
+        ("BabaIsYou-MoveObj-v0", 9, 1), ("BabaIsYou-MoveObj-v0", 9, 2),
+        ("BabaIsYou-MakeRule-v0", None, 1), ("BabaIsYou-MakeRule-v0", None, 2),
+    ]
+    for result in results:
+        assert all(result[metric] > 0 for metric in METRICS)
+
+    assert compare_to_baseline(results, results) == []
+    slower = [{**r, "reset_ms": 2 * r["reset_ms"], "steps_per_s": r["steps_per_s"] / 2} for r in results[:1]]
+    regressions = compare_to_baseline(slower, results, tolerance=0.2)
+    assert [r[3] for r in regressions] == ["reset_ms", "steps_per_s"]
+    assert compare_to_baseline(slower, results, tolerance=1.5) == []
+
+    broken = [{**r, "error": "ValueError"} for r in results[:1]]
+    assert [r[3] for r in compare_to_baseline(broken, results)] == ["error"]
+
+
+def test_benchmark_level_construction():
+    methods = {prop: getattr(FWall, prop) for prop in ["is_push", "is_stop"]}
+    # binding the property methods for every object, like before they were bound once, is slower
+    time = min(benchmark_level_construction(20, 1) for _ in range(3))
+    rebind_time = min(benchmark_level_construction(20, 1, rebind_properties=True) for _ in range(3))
+    assert 0 < time < rebind_time
+    # the classes of the objects are unchanged
+    assert methods == {prop: getattr(FWall, prop) for prop in ["is_push", "is_stop"]}
+
+
+def test_benchmark_vec_env():
+    # most of the steps of MakeRuleEnv only move or turn the agent, which are vectorized
+    results = benchmark_vec_env("BabaIsYou-MakeRule-v0", 64, num_steps=50, repeat=2)
+    assert results["vec_steps_per_s"] > results["loop_steps_per_s"] > 0
+
+
+def test_benchmark_subproc_vec_env():
+    # the workers write the observations in shared memory instead of pickling them
+    results = benchmark_subproc_vec_env("BabaIsYou-FourRoomEnv-v0", 8, envs_per_worker=4, num_steps=50, repeat=2)
+    assert results["subproc_steps_per_s"] > results["pipe_steps_per_s"] > 0
+    assert results["subproc_vectorize_steps_per_s"] > 0
@@ -4,6 +4,16 @@ import pytest
 from gym.envs.registration import EnvSpec
 from gym.utils.env_checker import check_env
 
+from baba_minigrid.envs.babaisyou import (
+    FourRoomEnv,
+    GoToObjEnv,
+    GoToWinObjEnv,
+    MakeRuleEnv,
+    MoveObjEnv,
+    OpenAndGoToWinEnv,
+    OpenShutObjEnv,
+    TestRuleEnv,
+)
 from baba_minigrid.minigrid import Grid, MissionSpace
 from tests.utils import all_testing_env_specs, assert_equals
 
@@ -252,3 +262,62 @@ def test_mission_space():
 
     assert mission_space.contains("get the green key and the green key.")
     assert mission_space.contains("go fetch the red ball and the green key.")
+
+
+@pytest.mark.parametrize(
+    "env_cls",
+    [GoToObjEnv, GoToWinObjEnv, MoveObjEnv, OpenShutObjEnv, OpenAndGoToWinEnv, FourRoomEnv, MakeRuleEnv, TestRuleEnv],
+)
+def test_babaisyou_seed(env_cls):
+    """The levels only depend on the seed passed to reset, not on the global random state"""
+    env_1 = env_cls()
+    env_2 = env_cls()
+    for seed in range(10):
+        np.random.seed(seed)
+        obs_1 = env_1.reset(seed=seed)
+        obs_2 = env_2.reset(seed=seed)
+        assert_equals(obs_1, obs_2)
+        assert env_1.hash() == env_2.hash()
+
+        # the next levels are also the same
+        assert_equals(env_1.reset(), env_2.reset())
+        assert env_1.hash() == env_2.hash()
+
+
+def test_babaisyou_seed_gym_0_21(monkeypatch, tmp_path):
+    """
+    With gym==0.21 (no reset in gym.Env, np_random is an attribute and seeding.np_random returns a RandomState), the
+    env seeds a Generator and generates the same levels as with the recent versions of gym
+    """
+    from baba_minigrid.trajectory import TrajectoryRecorder
+
+    def gen_levels(env):
+        env.reset(seed=0)
+        hashes = [env.hash()]
+        for _ in range(3):
+            env.reset()
+            hashes.append(env.hash())
+        return hashes
+
+    expected = gen_levels(FourRoomEnv())
+
+    def reset(self):
+        raise NotImplementedError
+
+    monkeypatch.setattr(gym.Env, "reset", reset)
+    monkeypatch.delattr(gym.Env, "np_random")
+    monkeypatch.setattr(gym.utils.seeding, "np_random", lambda seed=None: (np.random.RandomState(seed), seed))
+
+    env = FourRoomEnv()
+    assert gen_levels(env) == expected
+    assert isinstance(env.np_random, np.random.Generator)
+
+    # the state of the random generator is restored by set_state
+    state = env.get_state()
+    values = [env._rand_int(0, 1000) for _ in range(10)]
+    env.set_state(state)
+    assert [env._rand_int(0, 1000) for _ in range(10)] == values
+
+    env = TrajectoryRecorder(FourRoomEnv(), tmp_path / "episodes.traj")
+    env.reset()
+    env.close()
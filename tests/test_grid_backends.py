@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+
+from baba_minigrid.babaisyou import BabaIsYouGrid, BabaIsYouArrayGrid, place_rule
+from baba_minigrid.envs.babaisyou import FourRoomEnv, OpenAndGoToWinEnv
+from baba_minigrid.flexible_world_object import FBall, FKey, Baba, RuleIs, RuleBlock
+
+
+def test_array_grid_stack():
+    grid1 = BabaIsYouGrid(5, 5)
+    grid2 = BabaIsYouArrayGrid(5, 5, max_stack=1)
+    ball, key, baba, rule_is = FBall(), FKey(), Baba(), RuleIs()
+    for grid in [grid1, grid2]:
+        grid.set(2, 2, ball)
+        grid.set(2, 2, key)
+        grid.set(2, 2, baba)
+        grid.set(3, 2, rule_is)
+
+    # the array grid grows when more objects are stacked than max_stack
+    assert grid2.max_stack >= 3
+    for z in [-1, -2, -3, -4, 0, 1]:
+        assert grid1.get(2, 2, z) is grid2.get(2, 2, z)
+    assert grid1.get_under(2, 2) is grid2.get_under(2, 2)
+    assert grid1.get(2, 2, 'all') == grid2.get(2, 2, 'all')
+    assert grid1.grid == grid2.grid
+    assert list(grid1) == list(grid2)
+
+    for grid in [grid1, grid2]:
+        grid.pop(2, 2, -2)
+        grid.set(3, 2, None)
+        grid.set(3, 2, None)
+    assert grid1.grid == grid2.grid
+    assert grid2.stack_height[2, 2] == 2 and grid2.stack_height[3, 2] == 0
+
+
+@pytest.mark.parametrize("env_cls", [FourRoomEnv, OpenAndGoToWinEnv])
+@pytest.mark.parametrize("encoding_level", [1, 2])
+def test_array_grid_rollout(env_cls, encoding_level, random_rollout):
+    env1 = env_cls(encoding_level=encoding_level)
+    env1.reset(seed=0)
+    env2 = env_cls(encoding_level=encoding_level, grid_backend='array')
+    env2.reset(seed=0)
+    assert isinstance(env2.grid, BabaIsYouArrayGrid)
+
+    for action, obs1, reward1, done1 in random_rollout(env1, 100):
+        obs2, reward2, done2, _ = env2.step(action)
+        assert np.array_equal(obs1, obs2)
+        assert (reward1, done1) == (reward2, done2)
+        assert env1.hash() == env2.hash()
+        if done2:
+            env2.reset()
+
+
+def test_encode():
+    grid1 = BabaIsYouGrid(6, 5)
+    grid2 = BabaIsYouArrayGrid(6, 5)
+    ball, key, baba, rule_is = FBall(), FKey(), Baba(), RuleIs()
+    for grid in [grid1, grid2]:
+        grid.wall_rect(0, 0, 6, 5)
+        grid.set(2, 2, ball)
+        grid.set(2, 2, key)
+        grid.set(2, 2, baba)
+        grid.set(3, 1, rule_is)
+
+    vis_mask = np.zeros((6, 5), dtype=bool)
+    vis_mask[1:4, 1:3] = True
+    for encoding_level in [1, 2, 3, 4]:
+        for grid in [grid1, grid2]:
+            grid.encoding_level = encoding_level
+
+            for mask in [None, vis_mask]:
+                array = grid.encode(mask)
+                assert array.shape == (6, 5, 3 * encoding_level) and array.dtype == np.uint8
+                for i in range(6):
+                    for j in range(5):
+                        if mask is not None and not mask[i, j]:
+                            assert np.all(array[i, j] == 0)
+                            continue
+                        for z in range(encoding_level):
+                            expected = grid1.encode_cell(grid1.get(i, j, -z - 1))
+                            assert np.array_equal(array[i, j, 3 * z:3 * (z + 1)], expected)
+
+
+def test_incremental_obs(grid_backend, random_rollout):
+    env = FourRoomEnv(encoding_level=2, grid_backend=grid_backend, readonly_obs=True)
+    env.reset(seed=0)
+    for _, obs, _, _ in random_rollout(env, 200):
+        assert not obs.flags.writeable
+        assert np.array_equal(obs, env.grid.encode())
+    # observation of a reset
+    assert np.array_equal(env.reset(), env.grid.encode())
+
+
+@pytest.mark.parametrize("grid_backend", ["list", "array"])
+def test_mark_all_dirty(grid_backend):
+    env = FourRoomEnv(grid_backend=grid_backend)
+    obs, hash = env.reset(seed=0), env.hash()
+    env.grid.mark_all_dirty()
+    assert len(env.grid.dirty) == env.width * env.height
+    # all the cells are re-encoded, with the same observation and hash
+    assert np.array_equal(env.gen_obs(), obs) and env.hash() == hash
+    assert len(env.grid.dirty) == 0
+
+
+def test_property_index(grid_backend, random_rollout):
+    env = FourRoomEnv(grid_backend=grid_backend)
+    env.reset(seed=0)
+    for _ in random_rollout(env, 200):
+        for prop in env.grid.indexed_properties:
+            expected = {k for k, e in enumerate(env.grid) if e is not None and getattr(e, prop)()}
+            assert env.grid.get_index(prop) == expected
+        expected = {k for k, e in enumerate(env.grid) if isinstance(e, RuleBlock)}
+        assert env.grid.get_index('rule_block') == expected
+
+        positions = list(env.grid.iter_index('is_agent'))
+        assert positions == [(k % env.width, k // env.width) for k in sorted(env.grid.get_index('is_agent'))]
+
+
+@pytest.mark.parametrize("grid_cls", [BabaIsYouGrid, BabaIsYouArrayGrid])
+def test_iter_index_modified(grid_cls):
+    """
+    Modify the grid during iter_index, the positions are the same as with the naive implementation that takes the first
+    position after the current one in the index at each iteration
+    """
+    def naive_iter_index(grid, prop):
+        k = -1
+        while True:
+            positions = [p for p in grid.get_index(prop) if p > k]
+            if len(positions) == 0:
+                return
+            k = min(positions)
+            yield k % grid.width, k // grid.width
+
+    visited = []
+    for iter_index in [naive_iter_index, grid_cls.iter_index]:
+        rng = np.random.RandomState(0)
+        grid = grid_cls(10, 10)
+        for i, j in rng.randint(10, size=(30, 2)):
+            if grid.get(i, j) is None:
+                grid.set(i, j, RuleIs())
+        visited.append([])
+        for pos in iter_index(grid, 'is_push'):
+            visited[-1].append(pos)
+            # add or remove rule blocks before and after the current position
+            for i, j in rng.randint(10, size=(2, 2)):
+                grid.set(i, j, RuleIs() if grid.get(i, j) is None else None)
+        assert grid._index_iters.get('is_push', []) == []
+    assert len(visited[0]) > 20 and visited[0] == visited[1]
+
+
+def test_free_cells(grid_backend, random_rollout):
+    env = FourRoomEnv(grid_backend=grid_backend)
+    env.reset(seed=0)
+    for _ in random_rollout(env, 100):
+        expected = [[env.grid.get(i, j) is None for j in range(env.height)] for i in range(env.width)]
+        assert np.array_equal(env.grid.free_cells(), expected)
+
+    for vertical in [False, True]:
+        free = env.grid.free_cells()
+        positions = place_rule(env, 'fball', 'is_push', vertical=vertical)
+        assert all(free[pos] for pos in positions)
+        assert all(isinstance(env.grid.get(*pos), RuleBlock) for pos in positions)
+
+    # no free cell left in the rectangle
+    for i, j in [(1, 1), (2, 1), (1, 2), (2, 2)]:
+        if env.grid.get(i, j) is None:
+            ball = FBall()
+            ball.set_ruleset(env.get_ruleset())
+            env.put_obj(ball, i, j)
+    with pytest.raises(RecursionError):
+        env.place_obj(FKey(), top=(1, 1), size=(2, 2))
@@ -0,0 +1,43 @@
+import pytest
+
+from baba_minigrid.envs.babaisyou import FourRoomEnv, MakeRuleEnv
+
+
+@pytest.mark.parametrize("env_cls", [FourRoomEnv, MakeRuleEnv])
+def test_zobrist_hash(env_cls, grid_backend, random_rollout):
+    env = env_cls(encoding_level=2, grid_backend=grid_backend)
+    env.reset(seed=0)
+    hash_to_state, state_to_hash = {}, {}
+    for _ in random_rollout(env, 150):
+        # the incremental hash is the same as the hash of the whole grid
+        hash = env.hash()
+        env2 = env_cls(encoding_level=2, grid_backend=grid_backend)
+        env2.set_state(env.get_state())
+        env2._obs = None
+        assert env2.hash() == hash
+        assert len(hash) == 16 and env.hash(8) == hash[:8] and env.hash(32) == env.digest(32)
+
+        # one hash per state
+        state = (env.gen_obs().tobytes(), tuple(int(x) for x in env.agent_pos), env.agent_dir)
+        assert hash_to_state.setdefault(hash, state) == state
+        assert state_to_hash.setdefault(state, hash) == hash
+
+
+def test_hash_collision():
+    env = FourRoomEnv(check_hash_collisions=True)
+    env.reset(seed=0)
+    hash = env.hash()
+    assert env.hash() == hash
+
+    # simulate a collision with another state
+    env._hash_states[int(hash, 16)] = None
+    assert env.hash() == env.digest()
+
+    # the states seen during an episode are forgotten at reset
+    for action in range(len(env.actions)):
+        env.step(action)
+        env.hash()
+    assert len(env._hash_states) > 1
+    env.reset()
+    assert len(env._hash_states) == 0
+    assert env.hash() == hash
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def imported_modules(code, modules):
+    """
+    Modules imported after running code in a new python process
+    """
+    code += "\nimport sys; print(' '.join(m for m in {} if m in sys.modules))".format(modules)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+@pytest.mark.parametrize("module,lazy_modules", [
+    ("baba_minigrid", ["gym", "cv2", "matplotlib"]),
+    ("baba_minigrid.envs.babaisyou", ["matplotlib"]),
+])
+def test_lazy_imports(module, lazy_modules):
+    assert imported_modules("import {}".format(module), lazy_modules) == []
+
+
+def test_lazy_render_imports():
+    code = "\n".join([
+        "from baba_minigrid.envs.babaisyou import FourRoomEnv",
+        "env = FourRoomEnv()",
+        "env.reset(seed=0)",
+        "env.render('rgb_array')",
+    ])
+    # matplotlib is only needed to show a window
+    assert imported_modules(code, ["matplotlib"]) == []
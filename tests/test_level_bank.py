@@ -0,0 +1,88 @@
+import gym
+import numpy as np
+import pytest
+
+from baba_minigrid.babaisyou import BabaIsYouArrayGrid, BabaIsYouGrid
+from baba_minigrid.envs.babaisyou import FourRoomEnv, MoveObjEnv, OpenShutObjEnv
+from baba_minigrid.flexible_world_object import FBall
+from baba_minigrid.level_bank import LevelBankEnv, encode_level, generate_level_bank
+
+
+def test_encode_level():
+    env = FourRoomEnv()
+    env.reset(seed=0)
+    array = encode_level(env.grid, max_stack=2)
+    for grid_cls in [BabaIsYouGrid, BabaIsYouArrayGrid]:
+        grid = grid_cls.from_array(array)
+        assert np.array_equal(grid.encode(), env.grid.encode())
+        assert np.array_equal(grid.free_cells(), env.grid.free_cells())
+
+    # stack a ball on a wall
+    ball = FBall()
+    ball.set_ruleset(env.get_ruleset())
+    env.grid.set(0, 0, ball)
+    with pytest.raises(ValueError):
+        encode_level(env.grid, max_stack=1)
+
+
+@pytest.mark.parametrize("env_id,env_cls", [
+    ("BabaIsYou-MoveObj-v0", MoveObjEnv),
+    ("BabaIsYou-OpenShutObj-v0", OpenShutObjEnv),
+    ("BabaIsYou-FourRoomEnv-v0", FourRoomEnv),
+])
+def test_level_bank(tmp_path, env_id, env_cls, grid_backend, random_rollout):
+    bank = generate_level_bank(env_id, tmp_path, num_levels=20, seed=10, chunk_size=8)
+    assert len(bank) == 20 and bank.index_of_seed(15) == 5 and bank.index_of_seed(30) is None
+
+    env1 = env_cls(grid_backend=grid_backend)
+    env2 = LevelBankEnv(env_cls(grid_backend=grid_backend), bank)
+    for seed in range(10, 30):
+        # same levels and same rollouts as the levels generated by the env
+        obs1 = env1.reset(seed=seed)
+        obs2 = env2.reset(seed=seed)
+        assert np.array_equal(obs1, obs2)
+        assert env1.hash() == env2.hash()
+
+        for action, obs1, reward1, done1 in random_rollout(env1, 50, seed=seed):
+            obs2, reward2, done2, _ = env2.step(action)
+            assert np.array_equal(obs1, obs2)
+            assert (reward1, done1) == (reward2, done2)
+            if done1:
+                break
+
+    env2.reset(options={'level_idx': 3})
+    env1.reset(seed=13)
+    assert env1.hash() == env2.hash()
+
+    # random level of the bank for a seed that isn't in the bank
+    env2.reset(seed=0)
+    hashes = set()
+    for seed in range(10, 30):
+        env1.reset(seed=seed)
+        hashes.add(env1.hash())
+    assert env2.hash() in hashes
+
+
+class GoalColorEnv(FourRoomEnv):
+    def _gen_grid(self, width, height):
+        super()._gen_grid(width, height)
+        # often the same string as in the previous level
+        self.goal_color = self._rand_elem(['red', 'blue'])
+
+
+def test_level_bank_attrs(tmp_path):
+    gym.register("BabaIsYou-GoalColorEnv-v0", entry_point=GoalColorEnv)
+    bank = generate_level_bank("BabaIsYou-GoalColorEnv-v0", tmp_path, num_levels=20, chunk_size=8)
+
+    env1 = GoalColorEnv()
+    env2 = LevelBankEnv(GoalColorEnv(), bank)
+    for seed in np.random.RandomState(0).permutation(20):
+        env1.reset(seed=int(seed))
+        env2.reset(seed=int(seed))
+        assert env2.unwrapped.goal_color == env1.goal_color
+
+    # the random level for a seed that isn't in the bank is sampled without generating a level
+    env2.unwrapped._gen_grid = None
+    env2.reset(seed=100)
+    idx = np.random.default_rng(100).integers(len(bank))
+    assert env2.unwrapped.goal_color == bank[idx].attrs['goal_color']
@@ -0,0 +1,107 @@
+from baba_minigrid.babaisyou import BabaIsYouEnv, BabaIsYouGrid
+from baba_minigrid.envs.babaisyou.goto import BaseGridEnv
+from baba_minigrid.flexible_world_object import Baba, FBall, FKey
+from baba_minigrid.minigrid import Wall
+
+
+class PushLineEnv(BaseGridEnv):
+    """
+    The agent pushes a line of balls to the right and pulls a key behind it
+    """
+    def __init__(self, **kwargs):
+        super().__init__(size=12, **kwargs)
+
+    def _gen_grid(self, width, height):
+        self.grid = BabaIsYouGrid(width, height)
+        self.grid.wall_rect(0, 0, width, height)
+
+        self.put_rule(obj='baba', property='is_agent', positions=[(1, 1), (2, 1), (3, 1)])
+        self.put_rule(obj='fball', property='is_push', positions=[(5, 1), (6, 1), (7, 1)])
+        self.put_rule(obj='fball', property='is_stop', positions=[(5, 6), (6, 6), (7, 6)])
+        self.put_rule(obj='fkey', property='is_pull', positions=[(1, 6), (2, 6), (3, 6)])
+
+        self.put_obj(FKey(), 1, 3)
+        self.put_obj(Baba(), 2, 3)
+        for i in range(3, 9):
+            self.put_obj(FBall(), i, 3)
+        self.place_agent()
+
+
+class PushPullLineEnv(BaseGridEnv):
+    """
+    The agent is behind a long line of alternating keys and balls that are both pushed and pulled
+    """
+    def __init__(self, line_length, wall=False, **kwargs):
+        self.line_length = line_length
+        self.wall = wall
+        # BaseGridEnv grids are square
+        BabaIsYouEnv.__init__(self, width=line_length + 8, height=9, max_steps=100, **kwargs)
+
+    def _gen_grid(self, width, height):
+        self.grid = BabaIsYouGrid(width, height)
+        self.grid.wall_rect(0, 0, width, height)
+
+        self.put_rule(obj='baba', property='is_agent', positions=[(1, 1), (2, 1), (3, 1)])
+        for n, obj in enumerate(['fball', 'fkey']):
+            self.put_rule(obj=obj, property='is_push', positions=[(5 + 4 * n, 1), (6 + 4 * n, 1), (7 + 4 * n, 1)])
+            self.put_rule(obj=obj, property='is_pull', positions=[(5 + 4 * n, 5), (6 + 4 * n, 5), (7 + 4 * n, 5)])
+
+        self.put_obj(Baba(), 1, 7)
+        for i in range(self.line_length):
+            self.put_obj(FBall() if i % 2 else FKey(), 2 + i, 7)
+        if self.wall:
+            # block the line
+            self.put_obj(Wall(), 2 + self.line_length, 7)
+        self.place_agent()
+
+
+def get_row(env, j):
+    return [None if e is None else e.type for e in (env.grid.get(i, j) for i in range(1, env.width - 1))]
+
+
+def test_push_pull_line(grid_backend):
+    env = PushLineEnv(grid_backend=grid_backend)
+    env.reset()
+    assert get_row(env, 3) == ['fkey', 'baba'] + ['fball'] * 6 + [None] * 2
+
+    env.step(env.actions.right)
+    assert get_row(env, 3) == [None, 'fkey', 'baba'] + ['fball'] * 6 + [None]
+    assert env.agent_pos == (3, 3)
+
+    env.step(env.actions.right)
+    assert get_row(env, 3) == [None] * 2 + ['fkey', 'baba'] + ['fball'] * 6
+    assert all(env.grid.get(i, 3).dir == 0 for i in range(3, 11))
+
+    # the line is blocked by the wall
+    env.step(env.actions.right)
+    assert get_row(env, 3) == [None] * 2 + ['fkey', 'baba'] + ['fball'] * 6
+    assert env.agent_pos == (4, 3)
+
+    # the pulled key is a stop obj
+    env.step(env.actions.left)
+    assert get_row(env, 3) == [None] * 2 + ['fkey', 'baba'] + ['fball'] * 6
+    assert env.agent_pos == (4, 3) and env.agent_dir == 2
+
+
+def test_push_pull_line_no_recursion(grid_backend):
+    line_length = 1200
+    line = ['fkey', 'fball'] * (line_length // 2)
+    env = PushPullLineEnv(line_length, grid_backend=grid_backend)
+    env.reset()
+    assert get_row(env, 7) == ['baba'] + line + [None] * 5
+
+    # the line is pushed, each object moves once
+    env.step(env.actions.right)
+    assert get_row(env, 7) == [None, 'baba'] + line + [None] * 4
+    assert env.agent_pos == (2, 7)
+
+    # the whole line is pulled
+    env.step(env.actions.left)
+    assert get_row(env, 7) == ['baba'] + line + [None] * 5
+    assert env.agent_pos == (1, 7)
+
+    env = PushPullLineEnv(line_length, wall=True, grid_backend=grid_backend)
+    env.reset()
+    env.step(env.actions.right)
+    assert get_row(env, 7) == ['baba'] + line + ['wall'] + [None] * 4
+    assert env.agent_pos == (1, 7)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from baba_minigrid.envs.babaisyou import FourRoomEnv
+from baba_minigrid.profiler import RESET_PHASES, STEP_PHASES, StepProfiler
+
+
+def test_step_profiler():
+    profiler = StepProfiler()
+    # envs sharing the same profiler
+    envs = [FourRoomEnv(profiler=profiler), FourRoomEnv()]
+    envs[1].profiler = profiler
+    env_without_profiler = FourRoomEnv()
+
+    for env in envs + [env_without_profiler]:
+        env.reset(seed=0)
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        action = rng.randint(1, len(env.actions))
+        outputs = [env.step(action) for env in envs + [env_without_profiler]]
+        # the profiler doesn't change the env
+        assert all(np.array_equal(outputs[0][0], output[0]) for output in outputs)
+        if outputs[0][2]:
+            for env in envs + [env_without_profiler]:
+                env.reset()
+
+    num_resets = profiler.counts[('reset', 'total')]
+    assert profiler.counts[('step', 'total')] == 100 and num_resets >= 2
+    for phase in STEP_PHASES:
+        assert profiler.counts[('step', phase)] == 100
+    for phase in RESET_PHASES:
+        assert profiler.counts[('reset', phase)] == num_resets
+
+    mean_times = profiler.mean_times()
+    assert sum(mean_times[('step', phase)] for phase in STEP_PHASES) <= mean_times[('step', 'total')]
+    assert 'gen_obs' in profiler.report()
+
+    total = StepProfiler().merge(profiler, profiler)
+    assert total.counts[('step', 'total')] == 200
+    profiler.clear()
+    assert len(profiler.times) == 0
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+
+from baba_minigrid import flexible_world_object
+from baba_minigrid.rendering import (
+    fill_coords,
+    point_in_circle,
+    point_in_line,
+    point_in_rect,
+    point_in_triangle,
+    rotate_fn,
+    TileAtlas,
+    TileCache,
+)
+from baba_minigrid.babaisyou import BabaIsYouGrid, BabaIsYouArrayGrid
+from baba_minigrid.envs.babaisyou import FourRoomEnv
+from baba_minigrid.flexible_world_object import RuleIs, RuleProperty, Baba
+
+
+def test_rule_block_glyph_cache():
+    flexible_world_object.glyph_cache.clear()
+    # tiles rendered by other tests
+    BabaIsYouGrid.tile_cache.clear()
+    blocks = [RuleIs(), RuleIs(), RuleProperty('is_push')]
+    # no text is rendered before the blocks are drawn
+    assert len(flexible_world_object.glyph_cache) == 0
+
+    assert blocks[0].img is blocks[1].img
+    assert not blocks[0].img.flags.writeable
+    assert len(flexible_world_object.glyph_cache) == 1
+
+    for tile_size in [16, 32]:
+        img = BabaIsYouGrid.render_tile(blocks[2], tile_size=tile_size)
+        assert img.shape == (tile_size, tile_size, 3)
+    assert len(flexible_world_object.glyph_cache) == 3
+
+
+def test_fill_coords():
+    shapes = [
+        point_in_rect(0.2, 0.8, 0.1, 0.9),
+        point_in_circle(0.5, 0.5, 0.31),
+        point_in_triangle((0.12, 0.19), (0.87, 0.50), (0.12, 0.81)),
+        rotate_fn(point_in_triangle((0.12, 0.19), (0.87, 0.50), (0.12, 0.81)), cx=0.5, cy=0.5, theta=0.5 * math.pi),
+        point_in_line(0.1, 0.3, 0.3, 0.7, r=0.03),
+    ]
+    for fn in shapes:
+        img = fill_coords(np.zeros((48, 32, 3), dtype=np.uint8), fn, (255, 0, 0))
+
+        # the shapes can still be evaluated one pixel at a time
+        expected = np.zeros((48, 32, 3), dtype=np.uint8)
+        for y in range(48):
+            for x in range(32):
+                if fn((x + 0.5) / 32, (y + 0.5) / 48):
+                    expected[y, x] = (255, 0, 0)
+        assert np.array_equal(img, expected)
+        assert np.any(img)
+
+
+def test_tile_cache():
+    cache = TileCache(capacity=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    # 'b' is the least recently used tile
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'size': 2, 'capacity': 2}
+
+    cache.set_capacity(1)
+    assert len(cache) == 1 and cache.evictions == 2
+
+
+def test_warm_up_tile_cache():
+    tile_cache = BabaIsYouGrid.tile_cache
+    BabaIsYouGrid.tile_cache = TileCache()
+    try:
+        BabaIsYouGrid.warm_up_tile_cache(tile_size=16)
+        n_tiles = len(BabaIsYouGrid.tile_cache)
+        assert n_tiles > 0
+
+        baba = Baba()
+        imgs = []
+        for dir in range(4):
+            baba.dir = dir
+            imgs.append(BabaIsYouGrid.render_tile(baba, tile_size=16))
+        assert BabaIsYouGrid.tile_cache.stats()['hits'] >= 4
+        assert len(BabaIsYouGrid.tile_cache) == n_tiles
+        # the tile of the agent depends on its direction
+        assert not np.array_equal(imgs[0], imgs[1])
+    finally:
+        BabaIsYouGrid.tile_cache = tile_cache
+
+
+def test_render_tile_atlas():
+    env = FourRoomEnv()
+    env.reset(seed=0)
+    highlight_mask = np.zeros((env.width, env.height), dtype=bool)
+    highlight_mask[2:5, 1:4] = True
+
+    for grid in [env.grid, BabaIsYouArrayGrid.from_grid(env.grid)]:
+        for tile_size in [8, 32]:
+            img = grid.render(tile_size, highlight_mask=highlight_mask)
+            assert img.shape == (env.height * tile_size, env.width * tile_size, 3)
+            for i in range(env.width):
+                for j in range(env.height):
+                    tile = BabaIsYouGrid.render_tile(grid.get(i, j), highlight=highlight_mask[i, j], tile_size=tile_size)
+                    assert np.array_equal(img[j * tile_size:(j + 1) * tile_size, i * tile_size:(i + 1) * tile_size], tile.astype(np.uint8))
+
+    # the atlas is cleared when full
+    atlas = TileAtlas(tile_size=4, max_tiles=3)
+    idx = atlas.indices(["a", "b", "a"], lambda k: np.full((4, 4, 3), k))
+    assert idx.tolist() == [0, 1, 0] and len(atlas) == 2
+    idx = atlas.indices(["c", "d"], lambda k: np.full((4, 4, 3), k))
+    assert idx.tolist() == [0, 1] and len(atlas) == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from baba_minigrid.envs.babaisyou import FourRoomEnv, TestRuleEnv, MakeRuleEnv
+from baba_minigrid.flexible_world_object import Ruleset, FBall, FWall, Baba, properties
+from baba_minigrid.minigrid import COLOR_TO_IDX, OBJECT_TO_IDX
+from baba_minigrid.rule import extract_ruleset
+
+
+@pytest.mark.parametrize("env_cls", [FourRoomEnv, TestRuleEnv, MakeRuleEnv])
+def test_rule_index(env_cls, grid_backend, random_rollout):
+    env = env_cls(grid_backend=grid_backend)
+    env.reset(seed=0)
+    # ruleset before the step (None after a reset)
+    ruleset = env._rule_index.get_ruleset()
+    n_changes = 0
+    for _, _, _, done in random_rollout(env, 500):
+        expected = extract_ruleset(env.grid, default_ruleset=env.default_ruleset)
+        assert env._rule_index.get_ruleset() == expected
+        assert env.get_ruleset().get('_rule_') == expected.get('_rule_')
+        n_changes += ruleset is not None and ruleset != expected
+        ruleset = None if done else expected
+
+    if env_cls == FourRoomEnv:
+        # the random policy breaks some rules
+        assert n_changes > 0
+
+
+def test_compiled_ruleset():
+    ruleset_dict = {
+        'is_goal': {'fball': True, 'fball_color': {'red'}},
+        'is_push': {'fwall': True, 'fball': False},
+        'is_agent': {'baba': True},
+    }
+    ruleset = Ruleset(ruleset_dict)
+    red_ball, green_ball, wall, baba = FBall('red'), FBall('green'), FWall(), Baba()
+    for obj in [red_ball, green_ball, wall, baba]:
+        obj.set_ruleset(ruleset)
+
+    assert red_ball.is_goal() and not green_ball.is_goal()
+    assert wall.is_push() and not red_ball.is_push()
+    # is_agent implies is_stop
+    assert baba.is_agent() and baba.is_stop() and not baba.can_overlap()
+    assert not wall.is_stop()
+    # reading the properties doesn't modify the ruleset
+    assert 'is_stop' not in ruleset_dict
+
+    ruleset.set({'is_stop': {'fwall': True}})
+    assert wall.is_stop() and not baba.is_agent() and not baba.is_stop()
+
+
+def test_compiled_ruleset_new_type(monkeypatch):
+    ruleset = Ruleset({'is_goal': {'new_obj': True}, 'is_push': {'fball': True}})
+    assert ruleset.table.shape[1:] == (len(OBJECT_TO_IDX), len(COLOR_TO_IDX))
+
+    # object type and color registered after the compilation
+    monkeypatch.setitem(OBJECT_TO_IDX, 'new_obj', len(OBJECT_TO_IDX))
+    monkeypatch.setitem(COLOR_TO_IDX, 'new_color', len(COLOR_TO_IDX))
+    goal_idx = properties.index('is_goal')
+    assert ruleset.has_property(goal_idx, OBJECT_TO_IDX['new_obj'], COLOR_TO_IDX['new_color'])
+    assert ruleset.table.shape[1:] == (len(OBJECT_TO_IDX), len(COLOR_TO_IDX))
+    assert not ruleset.has_property(goal_idx, OBJECT_TO_IDX['fball'], COLOR_TO_IDX['new_color'])
+    assert ruleset.has_property(properties.index('is_push'), OBJECT_TO_IDX['fball'], COLOR_TO_IDX['green'])
@@ -0,0 +1,79 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from baba_minigrid.envs.babaisyou import FourRoomEnv, OpenAndGoToWinEnv
+
+
+def rollout(env, actions):
+    transitions = []
+    for action in actions:
+        obs, reward, done, _ = env.step(action)
+        transitions.append((obs.copy(), reward, done, env.hash()))
+        if done:
+            break
+    return transitions
+
+
+def assert_same_transitions(transitions1, transitions2):
+    assert len(transitions1) == len(transitions2)
+    for (obs1, reward1, done1, hash1), (obs2, reward2, done2, hash2) in zip(transitions1, transitions2):
+        assert np.array_equal(obs1, obs2)
+        assert (reward1, done1, hash1) == (reward2, done2, hash2)
+
+
+@pytest.mark.parametrize("env_cls", [FourRoomEnv, OpenAndGoToWinEnv])
+def test_get_set_state(env_cls, grid_backend):
+    env = env_cls(encoding_level=2, grid_backend=grid_backend)
+    env.reset(seed=0)
+    rng = np.random.RandomState(0)
+
+    for _ in range(10):
+        rollout(env, rng.randint(len(env.actions), size=rng.randint(10)))
+        state = env.get_state()
+        obs = env.gen_obs()
+        hash = env.hash()
+        assert not state.obs.flags.writeable
+
+        actions = rng.randint(len(env.actions), size=30)
+        transitions = rollout(env, actions)
+
+        env.set_state(state)
+        assert np.array_equal(env.gen_obs(), obs) and env.hash() == hash
+        assert_same_transitions(rollout(env, actions), transitions)
+
+        # restore a state of a previous episode
+        env.reset()
+        env.set_state(state)
+        assert np.array_equal(env.gen_obs(), obs) and env.hash() == hash
+        assert_same_transitions(rollout(env, actions), transitions)
+
+        # the random generator is restored, the next level is the same
+        env.set_state(state)
+        obs = env.reset()
+        env.set_state(state)
+        assert np.array_equal(env.reset(), obs)
+
+
+def test_snapshot_not_modified():
+    env = FourRoomEnv()
+    env.reset(seed=0)
+    env.agent_pos = np.array(env.agent_pos)
+    state = env.get_state()
+    obs, hash = env.gen_obs().copy(), env.hash()
+    ruleset_dict = deepcopy(env.get_ruleset().ruleset_dict)
+
+    # modify the mutable attributes and the ruleset of the env in place after the snapshot
+    env.agent_pos[:] = (1, 1)
+    env.get_ruleset()['is_goal'] = {'fwall': True}
+    env.get_ruleset()['is_agent']['fball'] = True
+    rollout(env, np.random.RandomState(0).randint(len(env.actions), size=20))
+
+    for _ in range(2):
+        env.set_state(state)
+        assert np.array_equal(env.gen_obs(), obs) and env.hash() == hash
+        assert env.get_ruleset().ruleset_dict == ruleset_dict
+        # modify the restored state
+        env.agent_pos[:] = (1, 1)
+        env.get_ruleset()['is_agent']['fball'] = True
@@ -0,0 +1,59 @@
+import struct
+
+import numpy as np
+import pytest
+
+from baba_minigrid.envs.babaisyou import FourRoomEnv, MoveObjEnv
+from baba_minigrid.trajectory import TrajectoryReader, TrajectoryRecorder, replay_episode
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "lzma", "bz2"])
+def test_trajectory_recorder(tmp_path, compression):
+    path = tmp_path / "episodes.traj"
+    env = TrajectoryRecorder(FourRoomEnv(), path, compression=compression, chunk_size=4, record_obs=True)
+    obs = env.reset(seed=0)
+    episodes = [{"obs": [obs], "actions": [], "rewards": []}]
+    rng = np.random.RandomState(0)
+    for _ in range(1000):
+        action = rng.randint(len(env.actions))
+        obs, reward, done, _ = env.step(action)
+        episodes[-1]["obs"].append(obs)
+        episodes[-1]["actions"].append(action)
+        episodes[-1]["rewards"].append(reward)
+        if done:
+            episodes.append({"obs": [env.reset()], "actions": [], "rewards": []})
+    env.close()
+
+    recorded = list(TrajectoryReader(path))
+    assert len(recorded) == len(episodes)
+    for episode, expected in zip(recorded, episodes):
+        assert np.array_equal(episode.obs, expected["obs"])
+        assert episode.actions.tolist() == expected["actions"]
+        assert np.allclose(episode.rewards, expected["rewards"])
+        assert episode.terminated == (episode.rewards[-1] != 0 if len(episode.rewards) > 0 else False)
+
+        # re-simulate the episode from its seed and actions
+        replay_obs = [obs for obs, _, _, _ in replay_episode(FourRoomEnv(), episode)]
+        assert np.array_equal(replay_obs, episode.obs[1:])
+
+
+def test_trajectory_append(tmp_path):
+    path = tmp_path / "episodes.traj"
+    for seed in [0, 1]:
+        env = TrajectoryRecorder(MoveObjEnv(), path, compression="zlib")
+        env.reset(seed=seed)
+        for _ in range(10):
+            env.step(env.actions.right)
+        env.close()
+
+    # truncated chunk at the end of the file (e.g. the worker was killed while writing)
+    with open(path, "ab") as f:
+        f.write(b"CHNK" + struct.pack("<IQ", 100, 1000) + b"{")
+
+    episodes = list(TrajectoryReader(path))
+    assert [e.seed for e in episodes] == [0, 1]
+    assert episodes[0].obs is None and len(episodes[0].actions) == 10
+
+    episode = episodes[1]._replace(seed=2)
+    with pytest.raises(ValueError):
+        list(replay_episode(MoveObjEnv(), episode))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from baba_minigrid.babaisyou import BabaIsYouEnv, BabaIsYouGrid
+from baba_minigrid.envs.babaisyou import FourRoomEnv, MakeRuleEnv, OpenShutObjEnv
+from baba_minigrid.flexible_world_object import Baba, RuleIs, RuleObject, RuleProperty
+from baba_minigrid.vector_env import BabaIsYouVecEnv, BabaIsYouSubprocVecEnv
+
+
+class AgentOnRuleEnv(BabaIsYouEnv):
+    """
+    The agent starts on the last block of the rule "ball is win"
+    """
+    def __init__(self, **kwargs):
+        super().__init__(grid_size=7, max_steps=100, **kwargs)
+
+    def _gen_grid(self, width, height):
+        self.grid = BabaIsYouGrid(width, height)
+        self.grid.wall_rect(0, 0, width, height)
+        self.put_obj(RuleObject('baba'), 1, 1)
+        self.put_obj(RuleIs(), 2, 1)
+        self.put_obj(RuleProperty('is_agent'), 3, 1)
+        self.put_obj(RuleObject('fball'), 2, 3)
+        self.put_obj(RuleIs(), 3, 3)
+        self.put_obj(RuleProperty('is_goal'), 4, 3)
+        self.put_obj(Baba(), 4, 3)
+
+
+@pytest.mark.parametrize("env_cls", [FourRoomEnv, MakeRuleEnv, OpenShutObjEnv])
+@pytest.mark.parametrize("encoding_level", [1, 2])
+def test_vec_env(env_cls, encoding_level, grid_backend):
+    num_envs = 8
+    vec_env = BabaIsYouVecEnv([lambda: env_cls(encoding_level=encoding_level)] * num_envs)
+    obs = vec_env.reset(seed=0)
+
+    # same steps as scalar envs with either grid backend
+    envs = [env_cls(encoding_level=encoding_level, grid_backend=grid_backend) for _ in range(num_envs)]
+    assert np.array_equal(obs, np.stack([env.reset(seed=n) for n, env in enumerate(envs)]))
+
+    rng = np.random.RandomState(0)
+    for _ in range(100):
+        actions = rng.randint(len(FourRoomEnv.Actions), size=num_envs)
+        obs, rewards, dones, infos = vec_env.step(actions)
+
+        for n, (env, action) in enumerate(zip(envs, actions)):
+            env_obs, reward, done, _ = env.step(action)
+            assert (rewards[n], dones[n]) == (reward, done)
+            if done:
+                assert np.array_equal(infos[n]["terminal_observation"], env_obs)
+                env_obs = env.reset()
+            assert np.array_equal(obs[n], env_obs)
+            assert vec_env.envs[n].hash() == env.hash()
+
+
+def test_vec_env_uncover_rule():
+    vec_env = BabaIsYouVecEnv([AgentOnRuleEnv] * 2)
+    vec_env.reset(seed=0)
+    env = AgentOnRuleEnv(grid_backend='array')
+    env.reset(seed=0)
+
+    # walk off the rule block (making the rule "ball is win"), walk back on it and push the rule
+    for action in [env.actions.down, env.actions.up, env.actions.left]:
+        obs, _, _, _ = vec_env.step([action, env.actions.idle])
+        env_obs, _, _, _ = env.step(action)
+        assert np.array_equal(obs[0], env_obs)
+        assert vec_env.envs[0].hash() == env.hash()
+        assert vec_env.envs[0].get_ruleset().ruleset_dict == env.get_ruleset().ruleset_dict
+        assert np.array_equal(vec_env.tables[0], env.get_ruleset().table)
+        if action == env.actions.down:
+            assert env.get_ruleset()['is_goal'] == {'fball': True}
+
+
+@pytest.mark.parametrize("vectorize", [False, True])
+def test_subproc_vec_env(vectorize):
+    num_envs = 5
+    vec_env = BabaIsYouSubprocVecEnv([FourRoomEnv] * num_envs, envs_per_worker=2, cpu_affinity=True,
+                                     vectorize=vectorize)
+    assert len(vec_env.processes) == 3
+
+    obs = vec_env.reset(seed=0)
+    assert obs.shape == (num_envs,) + vec_env.observation_space.shape
+    # the workers write the observations of their envs in the shared array
+    assert np.array_equal(obs, np.stack(vec_env.call("gen_obs")))
+
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        obs, rewards, dones, infos = vec_env.step(rng.randint(vec_env.action_space.n, size=num_envs))
+        assert rewards.shape == dones.shape == (num_envs,)
+        assert np.array_equal(obs, np.stack(vec_env.call("gen_obs")))
+        for n in np.flatnonzero(dones):
+            assert "terminal_observation" in infos[n]
+    vec_env.close()
@@ -0,0 +1,64 @@
+import pickle
+from copy import deepcopy
+
+import numpy as np
+
+from baba_minigrid import flexible_world_object
+from baba_minigrid.babaisyou import BabaIsYouArrayGrid, decode_obj
+from baba_minigrid.envs.babaisyou import FourRoomEnv
+from baba_minigrid.flexible_world_object import Baba, FBall, RuleColor, RuleIs, RuleObject, RuleProperty
+from baba_minigrid.minigrid import Box, Door, Key, Wall
+
+
+def test_slots():
+    objs = [FBall(), Baba(), RuleObject('fball'), RuleProperty('is_push'), RuleIs(), RuleColor('red'), Wall(),
+            Door('red'), Box('red', Key())]
+    for obj in objs:
+        assert not hasattr(obj, '__dict__')
+
+    ball = FBall('red')
+    assert (ball.name, ball.type_idx, ball.color_idx, ball.dir) == ('ball', FBall().type_idx, FBall('red').color_idx, 0)
+    assert RuleIs().margin == 10 and RuleIs().name == 'is'
+    assert Wall().contains is None and Box('red', ball).contains is ball
+    # only the objects that have a direction have a dir attribute
+    assert not hasattr(RuleIs(), 'dir') and not hasattr(Wall(), 'dir')
+
+
+def test_shared_kind():
+    # the objects with the same type and color share their kind
+    assert FBall('red').kind is FBall('red').kind and FBall('red').kind is not FBall('blue').kind
+    assert Wall().kind is decode_obj(*BabaIsYouArrayGrid.encode_obj(Wall())).kind
+    ball = FBall('red')
+    assert (ball.type, ball.color, ball.kind.type_idx) == ('fball', 'red', ball.type_idx)
+    ball.color = 'blue'
+    assert ball.kind is FBall('blue').kind and ball.color_idx == FBall('blue').color_idx
+    for copied_ball in [deepcopy(ball), pickle.loads(pickle.dumps(ball))]:
+        assert copied_ball is not ball and copied_ball.kind is ball.kind
+
+    assert not hasattr(flexible_world_object, 'prop')
+
+
+def test_decode_obj():
+    env = FourRoomEnv()
+    env.reset(seed=0)
+    for cell in env.grid.grid:
+        for obj in cell[1:]:
+            decoded = decode_obj(*BabaIsYouArrayGrid.encode_obj(obj))
+            assert type(decoded) is type(obj) and decoded is not obj
+            assert decoded.encode() == obj.encode() and hasattr(decoded, 'dir') == hasattr(obj, 'dir')
+
+
+def test_copy_grid():
+    env = FourRoomEnv()
+    env.reset(seed=0)
+    # push a rule block to set its dir
+    for action in [env.actions.up, env.actions.right, env.actions.right]:
+        env.step(action)
+    assert env.grid.get(4, 1).name == 'push' and env.grid.get(4, 1).dir == 3
+
+    for grid in [deepcopy(env.grid), pickle.loads(pickle.dumps(env.grid))]:
+        assert np.array_equal(grid.encode(), env.grid.encode())
+        for cell, copied_cell in zip(env.grid.grid, grid.grid):
+            for obj, copied_obj in zip(cell[1:], copied_cell[1:]):
+                assert copied_obj is not obj
+                assert getattr(copied_obj, 'dir', None) == getattr(obj, 'dir', None)
@@ -5,13 +5,15 @@ import numpy as np
 import pytest
 
 from baba_minigrid.envs import EmptyEnv
-from baba_minigrid.minigrid import MiniGridEnv
+from baba_minigrid.envs.babaisyou import FourRoomEnv
+from baba_minigrid.minigrid import COLOR_TO_IDX, OBJECT_TO_IDX, STATE_TO_IDX, MiniGridEnv
 from baba_minigrid.wrappers import (
     ActionBonus,
     DictObservationSpaceWrapper,
     FlatObsWrapper,
     FullyObsWrapper,
     ImgObsWrapper,
+    OneHotObsWrapper,
     OneHotPartialObsWrapper,
     ReseedWrapper,
     RGBImgObsWrapper,
@@ -235,3 +237,36 @@ def test_agent_sees_method(wrapper):
     assert (obs1["size"] == [5, 5]).all()
     for key in obs2:
         assert np.array_equal(obs1[key], obs2[key])
+
+
+@pytest.mark.parametrize("encoding_level", [1, 2])
+@pytest.mark.parametrize("readonly_obs", [False, True])
+def test_one_hot_obs_wrapper(encoding_level, readonly_obs):
+    env = FourRoomEnv(encoding_level=encoding_level, readonly_obs=readonly_obs)
+    onehot_env = OneHotObsWrapper(FourRoomEnv(encoding_level=encoding_level, readonly_obs=readonly_obs))
+    index_env = OneHotObsWrapper(FourRoomEnv(encoding_level=encoding_level), mode="index")
+    num_bits = len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + len(STATE_TO_IDX)
+
+    obs = env.reset(seed=0)
+    onehot_obs = onehot_env.reset(seed=0)
+    index_obs = index_env.reset(seed=0)
+    rng = np.random.RandomState(0)
+    for _ in range(50):
+        assert onehot_env.observation_space.contains(onehot_obs)
+        assert index_env.observation_space.contains(index_obs)
+
+        expected = np.zeros((*obs.shape[:2], encoding_level * num_bits), dtype=np.uint8)
+        for i in range(obs.shape[0]):
+            for j in range(obs.shape[1]):
+                for z in range(encoding_level):
+                    type, color, state = obs[i, j, 3 * z:3 * (z + 1)]
+                    expected[i, j, z * num_bits + type] = 1
+                    expected[i, j, z * num_bits + len(OBJECT_TO_IDX) + color] = 1
+                    expected[i, j, z * num_bits + len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + state] = 1
+        assert np.array_equal(onehot_obs, expected)
+        assert np.array_equal(np.take_along_axis(expected, index_obs, axis=2), np.ones_like(index_obs))
+
+        action = rng.randint(len(env.actions))
+        obs, _, _, _ = env.step(action)
+        onehot_obs, _, _, _ = onehot_env.step(action)
+        index_obs, _, _, _ = index_env.step(action)